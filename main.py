@@ -1,11 +1,13 @@
 """Entry point for the Ainia Adventure Stories application."""
 
 import sys
-import os
 import argparse
+from pathlib import Path
 
-# Add src to path for package imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+# Add src to path for package imports (once, even if this module is re-run)
+SRC_DIR = str(Path(__file__).resolve().parent / 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
 
 def main():
     """Main entry point with support for different app versions."""
@@ -1,36 +1,147 @@
 """Stress testing and concurrent session validation for Ainia Adventure Stories."""
 
+import argparse
+import json
 import time
 import threading
 import sys
 import os
 import statistics
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from array import array
+from collections import Counter
+from itertools import compress
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Tuple
 
+# Optional GIL contention sampling (Linux only); must be initialised before any threads start
+try:
+    import gil_load
+except ImportError:
+    gil_load = None
+else:
+    gil_load.init()
+
 # Add src to path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ainia.core.story_generator import StoryGenerator
+from ainia.core.learning_integrator import LearningIntegrator
+from ainia.utils.safety_validator import SafetyValidator
+
+# The demo persona definitions are not part of this tree; without them personas must be passed in
+try:
+    from demo_personas import DemoScenarioRunner
+except ImportError:
+    DemoScenarioRunner = None
+
+
+# Per-process runner used when sessions run in a ProcessPoolExecutor
+_worker_runner = None
+
+
+def _init_worker(api_key: str, personas: List):
+    """Build the components once in each worker process."""
+    global _worker_runner
+    _worker_runner = StressTestRunner(api_key, personas)
 
-from demo_personas import DemoScenarioRunner
-from story_generator import StoryGenerator
-from learning_integrator import LearningIntegrator
-from safety_validator import SafetyValidator
+
+def _simulate_in_worker(session_id: int, persona_name: str) -> Dict:
+    """Picklable entry point that runs one session in a worker process."""
+    return _worker_runner.simulate_user_session(session_id, persona_name)
 
 
 class StressTestRunner:
     """Runs stress tests on the Ainia Adventure Stories application."""
     
-    def __init__(self, api_key: str = "test_key"):
+    def __init__(self, api_key: str = "test_key", personas: List = None):
         self.api_key = api_key
-        self.demo_runner = DemoScenarioRunner()
-        self.personas = self.demo_runner.get_personas()
-        self.results = []
-        self.lock = threading.Lock()
+        self._executor = None  # Thread pool reused across stress phases
+        self._executor_workers = 0
+        if personas is None:
+            if DemoScenarioRunner is None:
+                raise RuntimeError("demo_personas is not available; pass personas to StressTestRunner")
+            personas = DemoScenarioRunner().get_personas()
+        self.personas = list(personas)
+        if not self.personas:
+            raise ValueError("StressTestRunner needs at least one persona")
+        self._persona_names = [persona.name for persona in self.personas]
+        self._results_lock = threading.Lock()  # Keeps the result columns aligned row by row
+        self._reset_results()
+        
+        # Components are stateless between calls, so every session shares one set
+        self.story_generator = StoryGenerator(api_key)
+        self.learning_integrator = LearningIntegrator()
+        self.safety_validator = SafetyValidator()
+        
+        # Prompts are deterministic and sessions cycle through a handful of personas
+        self._embed_math = lru_cache(maxsize=32)(self.learning_integrator.embed_math_challenge)
+        self._embed_vocabulary = lru_cache(maxsize=32)(self.learning_integrator.embed_vocabulary_challenge)
+        self._embed_problem_solving = lru_cache(maxsize=32)(self.learning_integrator.embed_problem_solving_challenge)
+        
+        # Pick each persona's prompt builder and safety-check text once instead of every session
+        self._session_plans = {
+            persona.name: (
+                persona,
+                self._select_prompt_builder(persona.learning_focus),
+                f"{persona.name} went on a {persona.preferred_theme} adventure and learned about {persona.learning_focus}."
+            )
+            for persona in self.personas
+        }
+    
+    def _reset_results(self):
+        """Clear the per-session result columns."""
+        # Stored column-wise: compact typed arrays instead of one dict per session
+        self._durations = array('d')
+        self._successes = array('b')
+        self._process_ids = array('q')
+        self._thread_ids = array('Q')
+        self._errors = []  # One message per failed session
+    
+    def _record_result(self, result: Dict):
+        """Append one session's result to the columns."""
+        with self._results_lock:
+            self._durations.append(result['duration'])
+            self._successes.append(result['success'])
+            self._process_ids.append(result['process_id'])
+            self._thread_ids.append(result['thread_id'])
+            if not result['success']:
+                self._errors.append(result.get('error', 'Unknown'))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Shut down the shared thread pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._executor_workers = 0
+    
+    def _get_executor(self, max_workers: int) -> ThreadPoolExecutor:
+        """Return the shared thread pool, rebuilding it only if a different size is requested."""
+        if self._executor is None or self._executor_workers != max_workers:
+            self.close()
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+            self._executor_workers = max_workers
+        return self._executor
+    
+    def _select_prompt_builder(self, learning_focus: str):
+        """Return the LearningIntegrator method matching a learning focus."""
+        if "counting" in learning_focus or "addition" in learning_focus:
+            return self._embed_math
+        elif "vocabulary" in learning_focus:
+            return self._embed_vocabulary
+        else:
+            return self._embed_problem_solving
     
     def simulate_user_session(self, session_id: int, persona_name: str) -> Dict:
         """Simulate a complete user session."""
-        session_start = time.time()
-        persona = self.demo_runner.get_persona_by_name(persona_name)
+        session_start = time.perf_counter()
+        persona, build_prompt, test_content = self._session_plans.get(persona_name, (None, None, None))
         
         if not persona:
             return {
@@ -42,148 +153,149 @@ class StressTestRunner:
         
         try:
             # Simulate story generation without API calls for stress testing
-            story_generator = StoryGenerator(self.api_key)
-            
-            # Test component initialization
-            learning_integrator = LearningIntegrator()
-            safety_validator = SafetyValidator()
-            
             # Test prompt building (lightweight operation)
-            if "counting" in persona.learning_focus or "addition" in persona.learning_focus:
-                prompt = learning_integrator.embed_math_challenge(persona.preferred_theme, persona.name)
-            elif "vocabulary" in persona.learning_focus:
-                prompt = learning_integrator.embed_vocabulary_challenge(persona.preferred_theme, persona.name)
-            else:
-                prompt = learning_integrator.embed_problem_solving_challenge(persona.preferred_theme, persona.name)
+            prompt = build_prompt(persona.preferred_theme, persona.name)
             
             # Test safety validation
-            test_content = f"{persona.name} went on a {persona.preferred_theme} adventure and learned about {persona.learning_focus}."
-            is_safe = safety_validator.check_safety_principles(test_content)
-            
-            session_end = time.time()
-            duration = session_end - session_start
+            is_safe = self.safety_validator.check_safety_principles(test_content)
             
             result = {
                 'session_id': session_id,
                 'persona': persona.name,
                 'success': True,
-                'duration': duration,
                 'prompt_length': len(prompt) if prompt else 0,
-                'safety_validated': is_safe,
-                'thread_id': threading.get_ident()
+                'safety_validated': is_safe
             }
             
-            # Thread-safe result storage
-            with self.lock:
-                self.results.append(result)
-            
-            return result
-            
         except Exception as e:
-            session_end = time.time()
-            duration = session_end - session_start
-            
             result = {
                 'session_id': session_id,
                 'persona': persona_name,
                 'success': False,
-                'error': str(e),
-                'duration': duration,
-                'thread_id': threading.get_ident()
+                'error': str(e)
             }
-            
-            with self.lock:
-                self.results.append(result)
-            
-            return result
+        
+        # Timing and recording are shared by both outcomes
+        result['duration'] = time.perf_counter() - session_start
+        result['thread_id'] = threading.get_ident()
+        result['process_id'] = os.getpid()
+        self._record_result(result)
+        return result
     
-    def run_concurrent_sessions(self, num_sessions: int, max_workers: int = 5) -> Dict:
-        """Run multiple concurrent user sessions."""
+    def run_concurrent_sessions(self, num_sessions: int, max_workers: int = 5, verbose: bool = False,
+                                use_processes: bool = False) -> Dict:
+        """Run multiple concurrent user sessions.
+        
+        Threads share the GIL, so pure-Python session work runs one at a time; pass
+        use_processes=True to spread sessions across worker processes instead.
+        """
         print(f"🚀 Starting stress test with {num_sessions} concurrent sessions...")
         print(f"👥 Max concurrent workers: {max_workers}")
         print("=" * 60)
         
-        self.results = []  # Reset results
-        start_time = time.time()
-        
-        # Create session assignments (cycle through personas)
-        session_assignments = []
-        for i in range(num_sessions):
-            persona = self.personas[i % len(self.personas)]
-            session_assignments.append((i + 1, persona.name))
-        
-        # Run concurrent sessions
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all sessions
-            future_to_session = {
-                executor.submit(self.simulate_user_session, session_id, persona_name): (session_id, persona_name)
-                for session_id, persona_name in session_assignments
-            }
+        # Session assignments (cycle through personas)
+        session_ids = range(1, num_sessions + 1)
+        persona_count = len(self._persona_names)
+        persona_names = [self._persona_names[i % persona_count] for i in range(num_sessions)]
+        warmup_names = [self._persona_names[i % persona_count] for i in range(max_workers)]
+        
+        # The pool is built before the clock starts, so worker start-up is never measured
+        if use_processes:
+            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                           initargs=(self.api_key, self.personas))
+            run_session = _simulate_in_worker
+        else:
+            executor = self._get_executor(max_workers)
+            run_session = self.simulate_user_session
+        
+        try:
+            # One untimed session per worker first, so worker start-up and first-call setup
+            # don't skew the measured durations
+            list(executor.map(run_session, [0] * max_workers, warmup_names))
+            self._reset_results()
             
-            # Collect results as they complete
-            completed = 0
-            for future in as_completed(future_to_session):
-                session_id, persona_name = future_to_session[future]
-                try:
-                    result = future.result()
-                    completed += 1
-                    
-                    if result['success']:
-                        print(f"✅ Session {session_id} ({persona_name}): {result['duration']:.3f}s")
-                    else:
-                        print(f"❌ Session {session_id} ({persona_name}): {result.get('error', 'Unknown error')}")
-                    
-                    # Show progress
-                    if completed % 10 == 0 or completed == num_sessions:
-                        progress = (completed / num_sessions) * 100
-                        print(f"   📊 Progress: {completed}/{num_sessions} ({progress:.1f}%)")
-                        
-                except Exception as e:
-                    print(f"💥 Session {session_id} ({persona_name}) failed: {e}")
-        
-        total_time = time.time() - start_time
+            # Run concurrent sessions; results come back in session order
+            if gil_load and not use_processes:
+                gil_load.start(av_sample_interval=0.05, reset_counts=True)
+            try:
+                start_time = time.perf_counter()
+                session_results = list(executor.map(run_session, session_ids, persona_names))
+                total_time = time.perf_counter() - start_time
+            finally:
+                if gil_load and not use_processes:
+                    gil_load.stop()
+        finally:
+            if use_processes:
+                executor.shutdown()
+        
+        if use_processes:
+            # Workers record into their own copies, so gather results here
+            # (unknown-persona results carry no worker info and are never recorded)
+            for result in session_results:
+                if 'thread_id' in result:
+                    self._record_result(result)
+        
+        gil_stats = gil_load.get()[0] if gil_load and not use_processes else None
+        
+        # Report per-session status only after timing, so console I/O isn't measured
+        if verbose:
+            for completed, (session_id, persona_name, result) in enumerate(
+                zip(session_ids, persona_names, session_results), start=1
+            ):
+                if result['success']:
+                    print(f"✅ Session {session_id} ({persona_name}): {result['duration']:.3f}s")
+                else:
+                    print(f"❌ Session {session_id} ({persona_name}): {result.get('error', 'Unknown error')}")
+                
+                # Show progress
+                if completed % 10 == 0 or completed == num_sessions:
+                    progress = (completed / num_sessions) * 100
+                    print(f"   📊 Progress: {completed}/{num_sessions} ({progress:.1f}%)")
         
         # Analyze results
-        return self._analyze_stress_test_results(total_time)
+        analysis = self._analyze_stress_test_results(total_time)
+        if 'error' not in analysis:
+            analysis['warmup_sessions'] = max_workers
+        if gil_stats and 'error' not in analysis:
+            analysis['gil'] = {'held': gil_stats['held'], 'wait': gil_stats['wait']}
+        return analysis
     
     def _analyze_stress_test_results(self, total_time: float) -> Dict:
         """Analyze stress test results and generate report."""
-        if not self.results:
+        total_sessions = len(self._durations)
+        if not total_sessions:
             return {'error': 'No results to analyze'}
         
-        successful_sessions = [r for r in self.results if r['success']]
-        failed_sessions = [r for r in self.results if not r['success']]
-        
         # Calculate metrics
-        durations = [r['duration'] for r in successful_sessions]
-        unique_threads = set(r['thread_id'] for r in self.results)
+        durations = array('d', compress(self._durations, self._successes))
+        successful_count = len(durations)
+        unique_threads = set(zip(self._process_ids, self._thread_ids))
+        mean_duration = statistics.fmean(durations) if durations else 0
+        sessions_per_second = total_sessions / total_time if total_time > 0 else 0
         
         analysis = {
-            'total_sessions': len(self.results),
-            'successful_sessions': len(successful_sessions),
-            'failed_sessions': len(failed_sessions),
-            'success_rate': (len(successful_sessions) / len(self.results)) * 100,
+            'total_sessions': total_sessions,
+            'successful_sessions': successful_count,
+            'failed_sessions': total_sessions - successful_count,
+            'success_rate': (successful_count / total_sessions) * 100,
             'total_test_time': total_time,
             'unique_threads_used': len(unique_threads),
             'performance_metrics': {
-                'avg_session_duration': statistics.mean(durations) if durations else 0,
+                'avg_session_duration': mean_duration,
                 'min_session_duration': min(durations) if durations else 0,
                 'max_session_duration': max(durations) if durations else 0,
-                'std_dev_duration': statistics.stdev(durations) if len(durations) > 1 else 0
+                'std_dev_duration': statistics.stdev(durations, mean_duration) if len(durations) > 1 else 0
             },
             'throughput': {
-                'sessions_per_second': len(self.results) / total_time if total_time > 0 else 0,
-                'avg_concurrent_sessions': len(self.results) / total_time * statistics.mean(durations) if durations and total_time > 0 else 0
+                'sessions_per_second': sessions_per_second,
+                # Little's law: mean sessions in flight = arrival rate x mean time in system
+                'avg_concurrent_sessions': sessions_per_second * mean_duration
             }
         }
         
         # Error analysis
-        if failed_sessions:
-            error_types = {}
-            for session in failed_sessions:
-                error = session.get('error', 'Unknown')
-                error_types[error] = error_types.get(error, 0) + 1
-            analysis['error_analysis'] = error_types
+        if self._errors:
+            analysis['error_analysis'] = dict(Counter(self._errors))
         
         return analysis
     
@@ -204,15 +316,31 @@ class StressTestRunner:
         num_test_sessions = 20
         results = []
         
+        # Each (theme, name) pair only needs its determinism check once across all threads
+        checked_keys = set()
+        checked_lock = threading.Lock()
+        
         def test_session_state(session_id):
             persona = self.personas[session_id % len(self.personas)]
+            key = (persona.preferred_theme, persona.name)
+            with checked_lock:
+                already_checked = key in checked_keys
+                checked_keys.add(key)
+            if already_checked:
+                return {
+                    'session_id': session_id,
+                    'persona': persona.name,
+                    'prompt_consistent': True
+                }
+            
             learning_integrator = LearningIntegrator()
             
             # Test that each session gets consistent results
             prompt1 = learning_integrator.embed_math_challenge(persona.preferred_theme, persona.name)
             prompt2 = learning_integrator.embed_math_challenge(persona.preferred_theme, persona.name)
             
-            # Results should be consistent for same inputs
+            # Results should be consistent for same inputs. Plain equality is the cheap check
+            # here: it compares lengths first, then memcmp, while hash() would scan both strings
             if prompt1 != prompt2:
                 validation_results['issues_found'].append(f"Session {session_id}: Inconsistent prompt generation")
                 validation_results['data_integrity'] = False
@@ -223,9 +351,9 @@ class StressTestRunner:
                 'prompt_consistent': prompt1 == prompt2
             }
         
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(test_session_state, i) for i in range(num_test_sessions)]
-            results = [future.result() for future in as_completed(futures)]
+        # Keep whatever pool size the stress phase used, so the shared pool isn't rebuilt
+        executor = self._get_executor(self._executor_workers or 10)
+        results = list(executor.map(test_session_state, range(num_test_sessions)))
         
         # Analyze session state results
         consistent_sessions = len([r for r in results if r['prompt_consistent']])
@@ -252,6 +380,7 @@ class StressTestRunner:
         print(f"   Failed: {stress_results['failed_sessions']}")
         print(f"   Success Rate: {stress_results['success_rate']:.1f}%")
         print(f"   Total Test Time: {stress_results['total_test_time']:.2f}s")
+        print(f"   Warm-up Sessions: {stress_results.get('warmup_sessions', 0)} (untimed, excluded)")
         print(f"   Threads Used: {stress_results['unique_threads_used']}")
         
         # Performance metrics
@@ -267,6 +396,11 @@ class StressTestRunner:
         throughput = stress_results['throughput']
         print(f"   Sessions/Second: {throughput['sessions_per_second']:.2f}")
         print(f"   Avg Concurrent Load: {throughput['avg_concurrent_sessions']:.2f}")
+        if 'gil' in stress_results:
+            gil = stress_results['gil']
+            print(f"   GIL Held: {gil['held']:.1%}  Waited: {gil['wait']:.1%}")
+            if gil['held'] > 0.9:
+                print("   ⚠️ GIL-bound: more threads won't add throughput; try use_processes=True")
         
         # Session state validation
         print(f"\n🔍 Session State Validation")
@@ -301,24 +435,47 @@ class StressTestRunner:
             print("   🔧 NEEDS ATTENTION - Some stability issues detected")
 
 
-def run_full_stress_test():
+def run_full_stress_test(num_sessions: int = 50, max_workers: int = 10, use_processes: bool = False,
+                         personas: List = None):
     """Run complete stress testing suite."""
     # Note: Using test API key for stress testing to avoid actual API calls
-    tester = StressTestRunner(api_key="test_key")
-    
-    # Test 1: Concurrent sessions
-    print("🏋️ Running concurrent session stress test...")
-    stress_results = tester.run_concurrent_sessions(num_sessions=50, max_workers=10)
+    with StressTestRunner(api_key="test_key", personas=personas) as tester:
+        # Test 1: Concurrent sessions
+        print("🏋️ Running concurrent session stress test...")
+        stress_results = tester.run_concurrent_sessions(
+            num_sessions=num_sessions, max_workers=max_workers, verbose=True, use_processes=use_processes
+        )
+        
+        # Test 2: Session state validation (reuses the same thread pool)
+        print("\n🔒 Running session state validation...")
+        validation_results = tester.run_session_state_validation()
+        
+        # Generate final report
+        tester.generate_stress_test_report(stress_results, validation_results)
     
-    # Test 2: Session state validation
-    print("\n🔒 Running session state validation...")
-    validation_results = tester.run_session_state_validation()
+    return stress_results, validation_results
+
+
+def main():
+    """Command-line entry point, so session and worker sweeps need no code edits."""
+    parser = argparse.ArgumentParser(description='Stress test Ainia Adventure Stories')
+    parser.add_argument('--sessions', type=int, default=50, help='Number of simulated sessions')
+    parser.add_argument('--workers', type=int, default=10, help='Maximum concurrent workers')
+    parser.add_argument('--processes', action='store_true', help='Run sessions in worker processes instead of threads')
+    parser.add_argument('--json', action='store_true', help='Print a JSON summary as the last line of output')
+    args = parser.parse_args()
     
-    # Generate final report
-    tester.generate_stress_test_report(stress_results, validation_results)
+    stress_results, validation_results = run_full_stress_test(
+        num_sessions=args.sessions, max_workers=args.workers, use_processes=args.processes
+    )
     
-    return stress_results, validation_results
+    if args.json:
+        print(json.dumps({
+            'config': {'sessions': args.sessions, 'workers': args.workers, 'processes': args.processes},
+            'stress': stress_results,
+            'validation': validation_results
+        }))
 
 
 if __name__ == "__main__":
-    run_full_stress_test()
\ No newline at end of file
+    main()
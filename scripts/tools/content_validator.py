@@ -4,7 +4,9 @@ import re
 import sys
 import os
 from typing import Dict, List, Tuple, Optional
+from collections import Counter
 from dataclasses import dataclass
+from functools import lru_cache
 
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
@@ -14,17 +16,45 @@ from learning_integrator import LearningIntegrator
 from safety_validator import SafetyValidator
 
 
-@dataclass
+# Precompiled patterns shared by all validator instances
+_WORD_RE = re.compile(r'\b[a-zA-Z]+\b')
+# Byte translation table flagging vowels as b'1' and everything else as b'0'
+_VOWEL_TABLE = bytes(ord('1') if chr(i) in 'aeiouy' else ord('0') for i in range(256))
+_NUMBER_RE = re.compile(r'\b(\d+)\b')
+_MATH_QUESTION_RE = re.compile(r'how many|\? *$')
+_VOCAB_CHALLENGE_RE = re.compile(r'what does.*mean|word.*is|vocabulary')
+_CONTEXT_CLUE_RE = re.compile(r'because|since|like|such as|means')
+_PROBLEM_SCENARIO_RE = re.compile(r'problem|challenge|help.*how|what.*do')
+_CREATIVE_PROMPT_RE = re.compile(r'what if|imagine|creative|different way')
+_CHARACTER_RE = re.compile(r'\b[A-Z][a-z]+\b')  # Proper nouns (likely characters)
+_ACTION_RE = re.compile(r'went|found|discovered|helped|saved|explored')
+
+
+def _compile_keywords(keywords: List[str]) -> re.Pattern:
+    """Compile a keyword list into a single alternation pattern."""
+    return re.compile('|'.join(map(re.escape, keywords)))
+
+
+def _count_keywords(pattern: re.Pattern, text: str) -> int:
+    """Count how many distinct keywords of a compiled set appear in text."""
+    return len(set(pattern.findall(text)))
+
+
+@dataclass(slots=True, frozen=True)
 class ContentQualityMetrics:
     """Metrics for evaluating content quality."""
     age_appropriate_score: float
     educational_value_score: float
     engagement_score: float
     safety_score: float
-    learning_alignment_score: float
     overall_score: float
     issues: List[str]
     recommendations: List[str]
+    
+    @property
+    def learning_alignment_score(self) -> float:
+        """Learning alignment is measured by the same analysis as educational value."""
+        return self.educational_value_score
 
 
 class EducationalContentValidator:
@@ -37,6 +67,12 @@ class EducationalContentValidator:
             'primary_upper': (9, 10)      # Grades 3-4
         }
         
+        # Direct age -> group lookup table; ages outside it default to the oldest group
+        self._age_to_group = ['primary_upper'] * 20
+        for group, (min_age, max_age) in self.age_groups.items():
+            for age in range(min_age, max_age + 1):
+                self._age_to_group[age] = group
+        
         # Age-appropriate vocabulary levels
         self.vocabulary_levels = {
             'early_childhood': {
@@ -77,28 +113,41 @@ class EducationalContentValidator:
                 'creative_thinking': True
             }
         }
+        
+        # Positive engagement indicators
+        self.engagement_words = ['adventure', 'exciting', 'magic', 'treasure', 'friend', 'fun', 'amazing', 'wonderful']
+        
+        # One compiled alternation per keyword set, so each text is scanned once per set
+        self._math_keywords_re = _compile_keywords(self.learning_patterns['counting_addition']['math_keywords'])
+        self._vocab_keywords_re = _compile_keywords(self.learning_patterns['vocabulary']['vocab_keywords'])
+        self._problem_keywords_re = _compile_keywords(self.learning_patterns['problem_solving']['problem_keywords'])
+        self._engagement_words_re = _compile_keywords(self.engagement_words)
+        
+        # Shared safety validator; results memoized per text since templated content repeats
+        self._safety = SafetyValidator()
+        self._safety_check_cached = lru_cache(maxsize=1024)(self._safety.check_safety_principles)
+        
+        # Per-age-group vocabulary analyzers with thresholds specialized at construction
+        self._vocab_analyzers = {
+            group: self._make_vocab_analyzer(**criteria)
+            for group, criteria in self.vocabulary_levels.items()
+        }
     
     def get_age_group(self, age: int) -> str:
         """Determine age group for given age."""
-        for group, (min_age, max_age) in self.age_groups.items():
-            if min_age <= age <= max_age:
-                return group
+        if 0 <= age < len(self._age_to_group):
+            return self._age_to_group[age]
         return 'primary_upper'  # Default for older kids
     
-    def count_syllables(self, word: str) -> int:
-        """Estimate syllable count in a word."""
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def count_syllables(word: str) -> int:
+        """Estimate syllable count in a word (memoized, story words repeat heavily)."""
         word = word.lower()
-        vowels = 'aeiouy'
-        syllables = 0
-        prev_was_vowel = False
-        
-        for char in word:
-            if char in vowels:
-                if not prev_was_vowel:
-                    syllables += 1
-                prev_was_vowel = True
-            else:
-                prev_was_vowel = False
+        # Each run of consecutive vowels counts as one syllable: a run starts at
+        # every consonant->vowel transition, plus once if the word opens on a vowel
+        flags = word.encode('ascii', 'replace').translate(_VOWEL_TABLE)
+        syllables = flags.count(b'01') + flags.startswith(b'1')
         
         # Handle silent e
         if word.endswith('e') and syllables > 1:
@@ -106,78 +155,89 @@ class EducationalContentValidator:
         
         return max(1, syllables)  # Every word has at least 1 syllable
     
-    def analyze_vocabulary_complexity(self, text: str, age_group: str) -> Dict:
-        """Analyze vocabulary complexity for age group."""
-        words = re.findall(r'\b[a-zA-Z]+\b', text.lower())
-        total_words = len(words)
-        
-        if total_words == 0:
-            return {'score': 0, 'issues': ['No words found in text']}
-        
-        vocab_criteria = self.vocabulary_levels[age_group]
-        
-        # Analyze word complexity
-        complex_words = 0
-        long_words = 0
-        high_syllable_words = 0
-        
-        for word in words:
-            syllables = self.count_syllables(word)
-            word_length = len(word)
+    def _make_vocab_analyzer(self, max_syllables: int, max_word_length: int,
+                             complex_words_threshold: float, **_):
+        """Build a vocabulary analyzer with one age group's thresholds bound as locals.
+        
+        Word classifications are memoized for the most recent distinct words, so a batch
+        of texts sharing vocabulary classifies each word only once without unbounded growth.
+        """
+        count_syllables = self.count_syllables
+        
+        @lru_cache(maxsize=4096)
+        def classify(word: str) -> Tuple[bool, bool]:
+            return (count_syllables(word) > max_syllables,
+                    len(word) > max_word_length)
+        
+        def analyze(words: List[str]) -> Dict:
+            total_words = len(words)
             
-            if syllables > vocab_criteria['max_syllables']:
-                high_syllable_words += 1
+            if total_words == 0:
+                return {'score': 0, 'issues': ['No words found in text']}
             
-            if word_length > vocab_criteria['max_word_length']:
-                long_words += 1
+            # Analyze word complexity once per distinct word, weighted by its frequency
+            complex_words = 0
+            long_words = 0
+            high_syllable_words = 0
             
-            # Consider word complex if it's long OR has many syllables
-            if (syllables > vocab_criteria['max_syllables'] or 
-                word_length > vocab_criteria['max_word_length']):
-                complex_words += 1
-        
-        complex_word_ratio = complex_words / total_words
-        
-        # Calculate score (lower complexity ratio = higher score)
-        if complex_word_ratio <= vocab_criteria['complex_words_threshold']:
-            vocab_score = 1.0
-        elif complex_word_ratio <= vocab_criteria['complex_words_threshold'] * 2:
-            vocab_score = 0.7
-        else:
-            vocab_score = 0.4
-        
-        issues = []
-        if complex_word_ratio > vocab_criteria['complex_words_threshold']:
-            issues.append(f"Vocabulary too complex: {complex_word_ratio:.1%} complex words (max {vocab_criteria['complex_words_threshold']:.1%})")
+            for word, occurrences in Counter(words).items():
+                too_many_syllables, too_long = classify(word)
+                
+                if too_many_syllables:
+                    high_syllable_words += occurrences
+                
+                if too_long:
+                    long_words += occurrences
+                
+                # Consider word complex if it's long OR has many syllables
+                if too_many_syllables or too_long:
+                    complex_words += occurrences
+            
+            complex_word_ratio = complex_words / total_words
+            
+            # Calculate score (lower complexity ratio = higher score)
+            if complex_word_ratio <= complex_words_threshold:
+                vocab_score = 1.0
+            elif complex_word_ratio <= complex_words_threshold * 2:
+                vocab_score = 0.7
+            else:
+                vocab_score = 0.4
+            
+            issues = []
+            if complex_word_ratio > complex_words_threshold:
+                issues.append(f"Vocabulary too complex: {complex_word_ratio:.1%} complex words (max {complex_words_threshold:.1%})")
+            
+            return {
+                'score': vocab_score,
+                'total_words': total_words,
+                'complex_words': complex_words,
+                'complex_word_ratio': complex_word_ratio,
+                'long_words': long_words,
+                'high_syllable_words': high_syllable_words,
+                'issues': issues
+            }
         
-        return {
-            'score': vocab_score,
-            'total_words': total_words,
-            'complex_words': complex_words,
-            'complex_word_ratio': complex_word_ratio,
-            'long_words': long_words,
-            'high_syllable_words': high_syllable_words,
-            'issues': issues
-        }
+        return analyze
+    
+    def analyze_vocabulary_complexity(self, words: List[str], age_group: str) -> Dict:
+        """Analyze vocabulary complexity of pre-tokenized words for age group."""
+        return self._vocab_analyzers[age_group](words)
     
-    def validate_learning_integration(self, text: str, learning_focus: str) -> Dict:
+    def validate_learning_integration(self, text: str, text_lower: str, learning_focus: str) -> Dict:
         """Validate that learning objectives are properly integrated."""
-        text_lower = text.lower()
-        
         if 'counting' in learning_focus or 'addition' in learning_focus:
             patterns = self.learning_patterns['counting_addition']
             
             # Check for math keywords
-            math_keywords_found = sum(1 for keyword in patterns['math_keywords'] 
-                                    if keyword in text_lower)
+            math_keywords_found = _count_keywords(self._math_keywords_re, text_lower)
             
             # Look for numbers in appropriate range
-            numbers = re.findall(r'\b(\d+)\b', text)
+            numbers = _NUMBER_RE.findall(text)
             appropriate_numbers = [int(n) for n in numbers 
                                  if patterns['number_range'][0] <= int(n) <= patterns['number_range'][1]]
             
             # Check for clear math problem
-            has_math_problem = bool(re.search(r'how many|\? *$', text_lower))
+            has_math_problem = bool(_MATH_QUESTION_RE.search(text_lower))
             
             score = 0.0
             if math_keywords_found >= 2:
@@ -205,16 +265,13 @@ class EducationalContentValidator:
             }
         
         elif 'vocabulary' in learning_focus:
-            patterns = self.learning_patterns['vocabulary']
-            
-            vocab_keywords_found = sum(1 for keyword in patterns['vocab_keywords'] 
-                                     if keyword in text_lower)
+            vocab_keywords_found = _count_keywords(self._vocab_keywords_re, text_lower)
             
             # Look for vocabulary challenge
-            has_vocab_challenge = bool(re.search(r'what does.*mean|word.*is|vocabulary', text_lower))
+            has_vocab_challenge = bool(_VOCAB_CHALLENGE_RE.search(text_lower))
             
             # Check for context clues
-            has_context_clues = bool(re.search(r'because|since|like|such as|means', text_lower))
+            has_context_clues = bool(_CONTEXT_CLUE_RE.search(text_lower))
             
             score = 0.0
             if vocab_keywords_found >= 1:
@@ -239,16 +296,13 @@ class EducationalContentValidator:
             }
         
         elif 'problem solving' in learning_focus:
-            patterns = self.learning_patterns['problem_solving']
-            
-            problem_keywords_found = sum(1 for keyword in patterns['problem_keywords'] 
-                                       if keyword in text_lower)
+            problem_keywords_found = _count_keywords(self._problem_keywords_re, text_lower)
             
             # Look for problem-solving scenario
-            has_problem_scenario = bool(re.search(r'problem|challenge|help.*how|what.*do', text_lower))
+            has_problem_scenario = bool(_PROBLEM_SCENARIO_RE.search(text_lower))
             
             # Check for creative thinking prompts
-            has_creative_prompt = bool(re.search(r'what if|imagine|creative|different way', text_lower))
+            has_creative_prompt = bool(_CREATIVE_PROMPT_RE.search(text_lower))
             
             score = 0.0
             if problem_keywords_found >= 2:
@@ -274,24 +328,17 @@ class EducationalContentValidator:
         
         return {'score': 0.0, 'issues': ['Unknown learning focus']}
     
-    def assess_engagement_factors(self, text: str) -> Dict:
+    def assess_engagement_factors(self, text: str, text_lower: str) -> Dict:
         """Assess factors that make content engaging for children."""
-        text_lower = text.lower()
-        
         # Positive engagement indicators
-        engagement_words = ['adventure', 'exciting', 'magic', 'treasure', 'friend', 'fun', 'amazing', 'wonderful']
-        engagement_count = sum(1 for word in engagement_words if word in text_lower)
+        engagement_count = _count_keywords(self._engagement_words_re, text_lower)
         
         # Story elements
-        has_character = bool(re.search(r'\b[A-Z][a-z]+\b', text))  # Proper nouns (likely characters)
-        has_action = bool(re.search(r'went|found|discovered|helped|saved|explored', text_lower))
+        has_character = bool(_CHARACTER_RE.search(text))
+        has_action = bool(_ACTION_RE.search(text_lower))
         has_dialogue = '"' in text or "'" in text
         has_question = '?' in text
         
-        # Narrative structure
-        has_beginning = bool(re.search(r'^(once|there was|in a|long ago)', text_lower))
-        has_ending = bool(re.search(r'(the end|finally|at last|lived happily)$', text_lower))
-        
         # Calculate engagement score
         score = 0.0
         if engagement_count >= 2:
@@ -336,20 +383,22 @@ class EducationalContentValidator:
         """Comprehensive content quality validation."""
         age_group = self.get_age_group(child_age)
         
+        # Lower and tokenize once, shared by all analyzers
+        text_lower = text.lower()
+        words = _WORD_RE.findall(text_lower)
+        
         # Run all validations
-        vocab_analysis = self.analyze_vocabulary_complexity(text, age_group)
-        learning_analysis = self.validate_learning_integration(text, learning_focus)
-        engagement_analysis = self.assess_engagement_factors(text)
+        vocab_analysis = self.analyze_vocabulary_complexity(words, age_group)
+        learning_analysis = self.validate_learning_integration(text, text_lower, learning_focus)
+        engagement_analysis = self.assess_engagement_factors(text, text_lower)
         
         # Safety validation
-        safety_validator = SafetyValidator()
-        safety_score = 1.0 if safety_validator.check_safety_principles(text) else 0.0
+        safety_score = 1.0 if self._safety_check_cached(text) else 0.0
         
         # Calculate overall scores
         age_appropriate_score = vocab_analysis['score']
         educational_value_score = learning_analysis['score']
         engagement_score = engagement_analysis['score']
-        learning_alignment_score = learning_analysis['score']
         
         # Overall score (weighted average)
         overall_score = (
@@ -359,14 +408,9 @@ class EducationalContentValidator:
             safety_score * 0.20
         )
         
-        # Collect all issues and recommendations
-        all_issues = []
-        all_issues.extend(vocab_analysis.get('issues', []))
-        all_issues.extend(learning_analysis.get('issues', []))
-        all_issues.extend(engagement_analysis.get('issues', []))
-        
-        all_recommendations = []
-        all_recommendations.extend(engagement_analysis.get('recommendations', []))
+        # Collect all issues and recommendations (every analyzer always returns 'issues')
+        all_issues = vocab_analysis['issues'] + learning_analysis['issues'] + engagement_analysis['issues']
+        all_recommendations = engagement_analysis['recommendations']
         
         if safety_score < 1.0:
             all_issues.append("Content failed safety validation")
@@ -376,7 +420,6 @@ class EducationalContentValidator:
             educational_value_score=educational_value_score,
             engagement_score=engagement_score,
             safety_score=safety_score,
-            learning_alignment_score=learning_alignment_score,
             overall_score=overall_score,
             issues=all_issues,
             recommendations=all_recommendations
@@ -385,45 +428,100 @@ class EducationalContentValidator:
     def generate_quality_report(self, metrics: ContentQualityMetrics, 
                               child_name: str, theme: str, learning_focus: str) -> str:
         """Generate a detailed quality assessment report."""
-        report = f"\n📋 CONTENT QUALITY REPORT - {child_name}\n"
-        report += f"Theme: {theme.title()}, Learning Focus: {learning_focus.title()}\n"
-        report += "=" * 50 + "\n"
-        
         # Overall assessment
         if metrics.overall_score >= 0.8:
-            report += "🌟 OVERALL QUALITY: EXCELLENT\n"
+            quality_label = "🌟 OVERALL QUALITY: EXCELLENT"
         elif metrics.overall_score >= 0.6:
-            report += "👍 OVERALL QUALITY: GOOD\n"
+            quality_label = "👍 OVERALL QUALITY: GOOD"
         elif metrics.overall_score >= 0.4:
-            report += "⚠️ OVERALL QUALITY: NEEDS IMPROVEMENT\n"
+            quality_label = "⚠️ OVERALL QUALITY: NEEDS IMPROVEMENT"
         else:
-            report += "❌ OVERALL QUALITY: POOR\n"
-        
-        report += f"Overall Score: {metrics.overall_score:.2f}/1.00\n\n"
-        
-        # Detailed scores
-        report += "📊 DETAILED SCORES:\n"
-        report += f"   Age Appropriateness: {metrics.age_appropriate_score:.2f}/1.00\n"
-        report += f"   Educational Value: {metrics.educational_value_score:.2f}/1.00\n"
-        report += f"   Engagement Factor: {metrics.engagement_score:.2f}/1.00\n"
-        report += f"   Safety Score: {metrics.safety_score:.2f}/1.00\n"
-        report += f"   Learning Alignment: {metrics.learning_alignment_score:.2f}/1.00\n\n"
+            quality_label = "❌ OVERALL QUALITY: POOR"
+        
+        # Header, assessment and detailed scores rendered as one block
+        parts = [
+            f"\n📋 CONTENT QUALITY REPORT - {child_name}\n"
+            f"Theme: {theme.title()}, Learning Focus: {learning_focus.title()}\n"
+            f"{'=' * 50}\n"
+            f"{quality_label}\n"
+            f"Overall Score: {metrics.overall_score:.2f}/1.00\n\n"
+            "📊 DETAILED SCORES:\n"
+            f"   Age Appropriateness: {metrics.age_appropriate_score:.2f}/1.00\n"
+            f"   Educational Value: {metrics.educational_value_score:.2f}/1.00\n"
+            f"   Engagement Factor: {metrics.engagement_score:.2f}/1.00\n"
+            f"   Safety Score: {metrics.safety_score:.2f}/1.00\n"
+            f"   Learning Alignment: {metrics.learning_alignment_score:.2f}/1.00\n\n"
+        ]
         
         # Issues found
         if metrics.issues:
-            report += "⚠️ ISSUES IDENTIFIED:\n"
-            for i, issue in enumerate(metrics.issues, 1):
-                report += f"   {i}. {issue}\n"
-            report += "\n"
+            parts.append("⚠️ ISSUES IDENTIFIED:\n")
+            parts.extend(f"   {i}. {issue}\n" for i, issue in enumerate(metrics.issues, 1))
+            parts.append("\n")
         
         # Recommendations
         if metrics.recommendations:
-            report += "💡 RECOMMENDATIONS:\n"
-            for i, rec in enumerate(metrics.recommendations, 1):
-                report += f"   {i}. {rec}\n"
-            report += "\n"
+            parts.append("💡 RECOMMENDATIONS:\n")
+            parts.extend(f"   {i}. {rec}\n" for i, rec in enumerate(metrics.recommendations, 1))
+            parts.append("\n")
         
-        return report
+        return "".join(parts)
+
+
+def _focus_bucket(learning_focus: str) -> str:
+    """Map a persona's learning focus onto the challenge type used to generate content."""
+    if "counting" in learning_focus or "addition" in learning_focus:
+        return 'math'
+    if "vocabulary" in learning_focus:
+        return 'vocabulary'
+    return 'problem_solving'
+
+
+def _make_content_generator(learning_integrator: LearningIntegrator):
+    """Build a memoized sample-content generator keyed on (bucket, theme, name)."""
+    @lru_cache(maxsize=None)
+    def generate(bucket: str, theme: str, child_name: str) -> Optional[str]:
+        if bucket == 'math':
+            return learning_integrator.embed_math_challenge(theme, child_name)
+        if bucket == 'vocabulary':
+            return learning_integrator.embed_vocabulary_challenge(theme, child_name)
+        return learning_integrator.embed_problem_solving_challenge(theme, child_name)
+    
+    return generate
+
+
+def _validate_one(persona, validator: EducationalContentValidator, generate_content) -> Optional[Dict]:
+    """Generate and validate sample content for a single persona."""
+    # Generate sample content for validation (shared across personas with the same inputs)
+    sample_content = generate_content(
+        _focus_bucket(persona.learning_focus), persona.preferred_theme, persona.name
+    )
+    
+    if not sample_content:
+        return None
+    
+    # Validate content quality
+    metrics = validator.validate_content_quality(
+        sample_content, 
+        persona.age, 
+        persona.learning_focus, 
+        persona.preferred_theme
+    )
+    
+    # Generate report
+    report = validator.generate_quality_report(
+        metrics, 
+        persona.name, 
+        persona.preferred_theme, 
+        persona.learning_focus
+    )
+    
+    return {
+        'persona': persona.name,
+        'metrics': metrics,
+        'content': sample_content[:100] + "..." if len(sample_content) > 100 else sample_content,
+        'report': report
+    }
 
 
 def run_educational_content_validation():
@@ -434,46 +532,17 @@ def run_educational_content_validation():
     validator = EducationalContentValidator()
     demo_runner = DemoScenarioRunner()
     personas = demo_runner.get_personas()
-    learning_integrator = LearningIntegrator()
+    generate_content = _make_content_generator(LearningIntegrator())
     
     validation_results = []
     
     for persona in personas:
         print(f"\n🧪 Validating content for {persona.name} (age {persona.age})...")
         
-        # Generate sample content for validation
-        if "counting" in persona.learning_focus or "addition" in persona.learning_focus:
-            sample_content = learning_integrator.embed_math_challenge(persona.preferred_theme, persona.name)
-        elif "vocabulary" in persona.learning_focus:
-            sample_content = learning_integrator.embed_vocabulary_challenge(persona.preferred_theme, persona.name)
-        else:
-            sample_content = learning_integrator.embed_problem_solving_challenge(persona.preferred_theme, persona.name)
-        
-        if sample_content:
-            # Validate content quality
-            metrics = validator.validate_content_quality(
-                sample_content, 
-                persona.age, 
-                persona.learning_focus, 
-                persona.preferred_theme
-            )
-            
-            # Generate report
-            report = validator.generate_quality_report(
-                metrics, 
-                persona.name, 
-                persona.preferred_theme, 
-                persona.learning_focus
-            )
-            
-            print(report)
-            
-            validation_results.append({
-                'persona': persona.name,
-                'metrics': metrics,
-                'content': sample_content[:100] + "..." if len(sample_content) > 100 else sample_content
-            })
-        
+        result = _validate_one(persona, validator, generate_content)
+        if result:
+            print(result.pop('report'))
+            validation_results.append(result)
         else:
             print(f"❌ Failed to generate content for {persona.name}")
     
@@ -483,10 +552,22 @@ def run_educational_content_validation():
     print("=" * 60)
     
     if validation_results:
-        avg_overall_score = sum(r['metrics'].overall_score for r in validation_results) / len(validation_results)
-        avg_educational_score = sum(r['metrics'].educational_value_score for r in validation_results) / len(validation_results)
-        avg_engagement_score = sum(r['metrics'].engagement_score for r in validation_results) / len(validation_results)
-        avg_age_appropriate_score = sum(r['metrics'].age_appropriate_score for r in validation_results) / len(validation_results)
+        # Accumulate all summary totals in a single pass over the results
+        sum_overall = sum_educational = sum_engagement = sum_age_appropriate = 0.0
+        total_issues = 0
+        for r in validation_results:
+            metrics = r['metrics']
+            sum_overall += metrics.overall_score
+            sum_educational += metrics.educational_value_score
+            sum_engagement += metrics.engagement_score
+            sum_age_appropriate += metrics.age_appropriate_score
+            total_issues += len(metrics.issues)
+        
+        num_results = len(validation_results)
+        avg_overall_score = sum_overall / num_results
+        avg_educational_score = sum_educational / num_results
+        avg_engagement_score = sum_engagement / num_results
+        avg_age_appropriate_score = sum_age_appropriate / num_results
         
         print(f"\n🎯 Average Scores:")
         print(f"   Overall Quality: {avg_overall_score:.2f}/1.00")
@@ -502,8 +583,6 @@ def run_educational_content_validation():
         else:
             print("\n🔧 ASSESSMENT: Content quality needs improvement")
         
-        # Count issues
-        total_issues = sum(len(r['metrics'].issues) for r in validation_results)
         print(f"\n⚠️ Total Issues Found: {total_issues}")
         
         if total_issues == 0:
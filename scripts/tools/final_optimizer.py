@@ -3,15 +3,39 @@
 import sys
 import os
 import time
+from functools import cache, lru_cache
 from typing import Dict, List
 
 # Add src to path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 
-from story_generator import StoryGenerator
-from learning_integrator import LearningIntegrator
-from safety_validator import SafetyValidator
-from prompt_builder import PromptBuilder
+from ainia.core.story_generator import CacheEntry, ErrorCode, StoryGenerator
+from ainia.core.learning_integrator import LearningIntegrator
+from ainia.utils.safety_validator import SafetyValidator
+from ainia.core.prompt_builder import PromptBuilder
+
+
+@lru_cache(maxsize=8)
+def _get_story_gen(api_key: str) -> StoryGenerator:
+    """Return a shared StoryGenerator for the given API key."""
+    return StoryGenerator(api_key)
+
+
+# (api_key, generate_adventure args, expected error code, pass message, failure message)
+ERROR_CASES = [
+    ("invalid_key", ("dragons", "TestChild", "counting and addition"), ErrorCode.INVALID_API_KEY,
+     "✅ API key error handling works", "API key error not handled properly"),
+    ("test_key", ("", "", ""), ErrorCode.EMPTY_INPUT,
+     "✅ Empty input handling works", "Empty input not handled properly"),
+    ("test_key", ("dragons", "A", "math"), ErrorCode.NAME_TOO_SHORT,
+     "✅ Short name validation works", "Short name validation not working"),
+]
+
+
+@cache
+def _integration_components():
+    """Build the prompt, learning and safety components once per process."""
+    return PromptBuilder(), LearningIntegrator(), SafetyValidator()
 
 
 class FinalOptimizer:
@@ -30,63 +54,24 @@ class FinalOptimizer:
             'errors_found': []
         }
         
-        # Test StoryGenerator error handling
-        try:
-            # Test with invalid API key
-            story_gen = StoryGenerator("invalid_key")
-            story, explanation = story_gen.generate_adventure(
-                "dragons", "TestChild", "counting and addition"
-            )
-            
-            # Should return error message, not crash
-            if isinstance(story, str) and "API key" in story:
-                results['passed_tests'] += 1
-                print("✅ API key error handling works")
+        for api_key, args, expected, passed_message, failed_message in ERROR_CASES:
+            # Only the shared test key is reused; a bad key gets a throwaway generator
+            if api_key == "test_key":
+                story_gen = _get_story_gen(api_key)
+                story_gen.clear_cache()
             else:
-                results['failed_tests'] += 1
-                results['errors_found'].append("API key error not handled properly")
-            
-            results['total_tests'] += 1
-        except Exception as e:
-            results['failed_tests'] += 1
-            results['errors_found'].append(f"StoryGenerator error handling failed: {e}")
-            results['total_tests'] += 1
-        
-        # Test with empty inputs
-        try:
-            story_gen = StoryGenerator("test_key")
-            story, explanation = story_gen.generate_adventure("", "", "")
-            
-            if isinstance(story, str) and "Oops" in story:
-                results['passed_tests'] += 1
-                print("✅ Empty input handling works")
-            else:
-                results['failed_tests'] += 1
-                results['errors_found'].append("Empty input not handled properly")
-            
-            results['total_tests'] += 1
-        except Exception as e:
-            results['failed_tests'] += 1
-            results['errors_found'].append(f"Empty input handling failed: {e}")
-            results['total_tests'] += 1
-        
-        # Test with very short name
-        try:
-            story_gen = StoryGenerator("test_key")
-            story, explanation = story_gen.generate_adventure("dragons", "A", "math")
+                story_gen = StoryGenerator(api_key)
+            story, explanation, error = story_gen.generate_adventure(*args)
             
-            if isinstance(story, str) and "2 letters" in story:
+            # Should return a friendly message and the matching error code, not crash
+            if isinstance(story, str) and error == expected:
                 results['passed_tests'] += 1
-                print("✅ Short name validation works")
+                print(passed_message)
             else:
                 results['failed_tests'] += 1
-                results['errors_found'].append("Short name validation not working")
+                results['errors_found'].append(failed_message)
             
             results['total_tests'] += 1
-        except Exception as e:
-            results['failed_tests'] += 1
-            results['errors_found'].append(f"Short name validation failed: {e}")
-            results['total_tests'] += 1
         
         print(f"Error handling tests: {results['passed_tests']}/{results['total_tests']} passed")
         return results
@@ -95,56 +80,70 @@ class FinalOptimizer:
         """Test for memory leaks and efficient usage."""
         print("🧠 Testing Memory Usage...")
         
-        import psutil
         import gc
+        import tracemalloc
+        import weakref
         
-        # Get initial memory
-        process = psutil.Process()
-        initial_memory = process.memory_info().rss / 1024 / 1024  # MB
-        
-        # Create multiple story generators and test memory usage
-        generators = []
-        for i in range(10):
-            gen = StoryGenerator("test_key")
-            # Simulate some cache usage
-            gen.cache[f"test_{i}"] = {
-                'story': f'Test story {i}',
-                'explanation': f'Test explanation {i}',
-                'original_child_name': f'Child{i}',
-                'timestamp': time.time()
-            }
-            generators.append(gen)
-        
-        # Check memory after creation
-        mid_memory = process.memory_info().rss / 1024 / 1024  # MB
-        memory_increase = mid_memory - initial_memory
-        
-        # Clean up
-        del generators
+        # Trace Python allocations made while the generators are alive
+        tracemalloc.start(10)
+        try:
+            snapshot_before = tracemalloc.take_snapshot()
+            
+            # Create multiple story generators and test memory usage; they all share one
+            # class-level cache, so this is per-instance footprint plus ten shared entries
+            generators = []
+            for i in range(10):
+                gen = StoryGenerator("test_key")
+                # Simulate some cache usage
+                gen._cache_put(f"test_{i}", CacheEntry(
+                    story=f'Test story {i}',
+                    explanation=f'Test explanation {i}',
+                    original_child_name=f'Child{i}'
+                ))
+                generators.append(gen)
+            
+            gc.collect()
+            gc.collect()
+            snapshot_after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+            # The test entries would otherwise stay in the shared cache for every later generator
+            StoryGenerator.clear_cache()
+        
+        # Attribute growth to the files that allocated it
+        growth = snapshot_after.compare_to(snapshot_before, 'filename')
+        memory_increase = sum(stat.size_diff for stat in growth) / 1024 / 1024  # MB
+        
+        # Every generator should be reclaimed once the last strong reference goes away
+        generator_count = len(generators)
+        refs = [weakref.ref(generator) for generator in generators]
+        del gen, generators
+        gc.collect()
         gc.collect()
+        alive = [ref() for ref in refs if ref() is not None]
         
-        # Check memory after cleanup
-        final_memory = process.memory_info().rss / 1024 / 1024  # MB
-        memory_recovered = mid_memory - final_memory
+        # Name whatever is still holding on, for triage
+        leak_referrers = sorted({type(referrer).__name__ for referrer in gc.get_referrers(alive[0])}) if alive else []
         
         results = {
-            'initial_memory_mb': initial_memory,
-            'peak_memory_mb': mid_memory,
-            'final_memory_mb': final_memory,
             'memory_increase_mb': memory_increase,
-            'memory_recovered_mb': memory_recovered,
-            'memory_efficient': memory_increase < 50,  # Less than 50MB increase
-            'cleanup_effective': memory_recovered > 0
+            'top_allocations': [str(stat) for stat in growth[:3]],
+            'leaked_instances': len(alive),
+            'leak_referrers': leak_referrers,
+            'memory_efficient': memory_increase < 50 and not alive  # Less than 50MB increase, nothing retained
         }
+        del alive
         
-        print(f"Memory usage: +{memory_increase:.1f}MB, recovered: {memory_recovered:.1f}MB")
+        print(f"Memory usage: +{memory_increase:.1f}MB traced across {generator_count} generators and one shared cache, "
+              f"{results['leaked_instances']} not reclaimed")
         return results
     
     def test_cache_efficiency(self) -> Dict:
         """Test caching system efficiency."""
         print("⚡ Testing Cache Efficiency...")
         
-        story_gen = StoryGenerator("test_key")
+        story_gen = _get_story_gen("test_key")
+        story_gen.clear_cache()
         
         # Test cache key generation
         cache_key1 = story_gen._generate_cache_key("dragons", "Emma", "math")
@@ -160,15 +159,17 @@ class FinalOptimizer:
         }
         
         # Test cache storage and retrieval
-        test_time = time.time()
-        story_gen.cache[cache_key1] = {
-            'story': 'Test story with Emma',
-            'explanation': 'Test explanation',
-            'original_child_name': 'Emma',
-            'timestamp': test_time
-        }
+        story_gen._cache_put(cache_key1, CacheEntry(
+            story='Test story with Emma',
+            explanation='Test explanation',
+            original_child_name='Emma'
+        ))
         results['cache_entries'] = len(story_gen.cache)
         
+        # A different theme was never stored, so this lookup must miss
+        miss_key = story_gen._generate_cache_key("pirates", "Emma", "math")
+        story_gen._get_cached_story(miss_key, "Emma")
+        
         # Test cache retrieval with personalization
         cached_story, cached_explanation = story_gen._get_cached_story(cache_key1, "Alex")
         
@@ -179,14 +180,24 @@ class FinalOptimizer:
             results['personalization_works'] = False
             print("❌ Cache personalization failed")
         
-        # Test cache expiry
-        old_time = test_time - 3700  # More than 1 hour ago
-        story_gen.cache[cache_key1]['timestamp'] = old_time
+        stats = story_gen.cache_stats()
+        results['cache_hits'] = stats.get('hits', 0)
+        results['cache_misses'] = stats.get('misses', 0)
+        lookups = results['cache_hits'] + results['cache_misses']
+        results['hit_ratio'] = results['cache_hits'] / lookups if lookups else 0.0
+        results['stats_tracked'] = results['cache_hits'] >= 1 and results['cache_misses'] >= 1
+        
+        # Test cache expiry: past its fresh window an entry is still served...
+        entry = story_gen.cache[cache_key1]
+        entry.fresh_until = time.monotonic() - 1
+        stale_but_usable = story_gen._is_cache_valid(entry) and not story_gen._is_cache_fresh(entry)
         
-        is_valid = story_gen._is_cache_valid(story_gen.cache[cache_key1])
-        results['expiry_works'] = not is_valid
+        # ...until its stale window runs out too
+        entry.stale_until = time.monotonic() - 1
+        is_valid = story_gen._is_cache_valid(entry)
+        results['expiry_works'] = stale_but_usable and not is_valid
         
-        if not is_valid:
+        if results['expiry_works']:
             print("✅ Cache expiry works")
         else:
             print("❌ Cache expiry failed")
@@ -205,44 +216,41 @@ class FinalOptimizer:
         
         try:
             # Test full pipeline
-            prompt_builder = PromptBuilder()
-            learning_integrator = LearningIntegrator()
-            safety_validator = SafetyValidator()
+            prompt_builder, learning_integrator, safety_validator = _integration_components()
             
-            # Test prompt building
-            prompt = prompt_builder.build_prompt("dragons", "TestChild", "counting and addition")
-            if prompt and "TestChild" in prompt and "dragons" in prompt:
-                results['passed_tests'] += 1
-                print("✅ Prompt building integration works")
-            else:
-                results['integration_issues'].append("Prompt building integration failed")
-            
-            results['integration_tests'] += 1
-            
-            # Test learning integration
-            math_prompt = learning_integrator.embed_math_challenge("dragons", "TestChild")
-            if math_prompt and "TestChild" in math_prompt and "dragons" in math_prompt:
-                results['passed_tests'] += 1
-                print("✅ Learning integration works")
-            else:
-                results['integration_issues'].append("Learning integration failed")
+            def check_prompt_building():
+                prompt = prompt_builder.build_prompt("dragons", "TestChild", "counting and addition")
+                if prompt and "TestChild" in prompt and "dragons" in prompt:
+                    return True, "✅ Prompt building integration works"
+                return False, "Prompt building integration failed"
             
-            results['integration_tests'] += 1
+            def check_learning_integration():
+                math_prompt = learning_integrator.embed_math_challenge("dragons", "TestChild")
+                if math_prompt and "TestChild" in math_prompt and "dragons" in math_prompt:
+                    return True, "✅ Learning integration works"
+                return False, "Learning integration failed"
             
-            # Test safety validation
-            safe_content = "Princess Emma found 3 magical flowers and wants to count them."
-            unsafe_content = "The scary monster frightened everyone with violence."
+            def check_safety_validation():
+                safe_content = "Princess Emma found 3 magical flowers and wants to count them."
+                unsafe_content = "The scary monster frightened everyone with violence."
+                
+                is_safe_good = safety_validator.check_safety_principles(safe_content)
+                is_unsafe_caught = not safety_validator.check_safety_principles(unsafe_content)
+                
+                if is_safe_good and is_unsafe_caught:
+                    return True, "✅ Safety validation integration works"
+                return False, "Safety validation integration failed"
             
-            is_safe_good = safety_validator.check_safety_principles(safe_content)
-            is_unsafe_caught = not safety_validator.check_safety_principles(unsafe_content)
-            
-            if is_safe_good and is_unsafe_caught:
-                results['passed_tests'] += 1
-                print("✅ Safety validation integration works")
-            else:
-                results['integration_issues'].append("Safety validation integration failed")
-            
-            results['integration_tests'] += 1
+            # The checks are cheap and CPU-bound, so they run in order
+            for check in (check_prompt_building, check_learning_integration, check_safety_validation):
+                passed, message = check()
+                if passed:
+                    results['passed_tests'] += 1
+                    print(message)
+                else:
+                    results['integration_issues'].append(message)
+                
+                results['integration_tests'] += 1
             
         except Exception as e:
             results['integration_issues'].append(f"Component integration failed: {e}")
@@ -264,13 +272,9 @@ class FinalOptimizer:
         error_results = self.test_error_handling()
         all_results['error_handling'] = error_results
         
-        # Test 2: Memory usage (if psutil available)
-        try:
-            memory_results = self.test_memory_usage()
-            all_results['memory_usage'] = memory_results
-        except ImportError:
-            print("⚠️ psutil not available, skipping memory tests")
-            all_results['memory_usage'] = {'skipped': True}
+        # Test 2: Memory usage
+        memory_results = self.test_memory_usage()
+        all_results['memory_usage'] = memory_results
         
         # Test 3: Cache efficiency
         cache_results = self.test_cache_efficiency()
@@ -295,14 +299,13 @@ class FinalOptimizer:
         cache_efficiency_good = (
             results['cache_efficiency'].get('cache_key_consistency', False) and
             results['cache_efficiency'].get('personalization_works', False) and
-            results['cache_efficiency'].get('expiry_works', False)
+            results['cache_efficiency'].get('expiry_works', False) and
+            results['cache_efficiency'].get('stats_tracked', False)
         )
         
         integration_good = (len(results['component_integration']['integration_issues']) == 0)
         
-        memory_good = True  # Assume good if not tested
-        if 'memory_usage' in results and not results['memory_usage'].get('skipped', False):
-            memory_good = results['memory_usage']['memory_efficient']
+        memory_good = results['memory_usage']['memory_efficient']
         
         return error_handling_good and cache_efficiency_good and integration_good and memory_good
     
@@ -324,13 +327,15 @@ class FinalOptimizer:
             print("   ✅ No error handling issues found")
         
         # Memory usage assessment
-        if not results['memory_usage'].get('skipped', False):
-            memory_results = results['memory_usage']
-            print(f"\n🧠 Memory Usage:")
-            print(f"   Memory Increase: {memory_results['memory_increase_mb']:.1f}MB")
-            print(f"   Memory Recovered: {memory_results['memory_recovered_mb']:.1f}MB")
-            print(f"   Memory Efficient: {'✅' if memory_results['memory_efficient'] else '❌'}")
-            print(f"   Cleanup Effective: {'✅' if memory_results['cleanup_effective'] else '❌'}")
+        memory_results = results['memory_usage']
+        print(f"\n🧠 Memory Usage:")
+        print(f"   Memory Increase: {memory_results['memory_increase_mb']:.1f}MB")
+        print(f"   Memory Efficient: {'✅' if memory_results['memory_efficient'] else '❌'}")
+        print(f"   Leaked Generators: {memory_results['leaked_instances']}")
+        if memory_results['leak_referrers']:
+            print(f"   Held By: {', '.join(memory_results['leak_referrers'])}")
+        for allocation in memory_results['top_allocations']:
+            print(f"     - {allocation}")
         
         # Cache efficiency assessment
         cache_results = results['cache_efficiency']
@@ -338,6 +343,8 @@ class FinalOptimizer:
         print(f"   Key Consistency: {'✅' if cache_results['cache_key_consistency'] else '❌'}")
         print(f"   Personalization: {'✅' if cache_results['personalization_works'] else '❌'}")
         print(f"   Expiry System: {'✅' if cache_results['expiry_works'] else '❌'}")
+        print(f"   Hit Ratio: {cache_results['hit_ratio']:.0%} "
+              f"({cache_results['cache_hits']} hits, {cache_results['cache_misses']} misses)")
         
         # Component integration assessment
         integration_results = results['component_integration']
@@ -5,10 +5,12 @@ import os
 import time
 import json
 import re
+import hashlib
 from dotenv import load_dotenv
 from openai import OpenAI
 from gtts import gTTS
 import io
+from concurrent.futures import ThreadPoolExecutor
 from streamlit_drawable_canvas import st_canvas
 from PIL import Image
 from ..core.multi_question_system import (
@@ -19,6 +21,102 @@ from ..core.multi_question_system import (
 # Load environment variables
 load_dotenv()
 
+# Synthesized narration is also kept on disk, so it survives app restarts
+TTS_CACHE_DIR = "tts_cache"
+
+# Generated story parts, shared by every child who picks the same adventure
+STORY_CACHE_PATH = "story_cache.sqlite3"
+
+# Narration for new story parts is synthesized here while the child reads
+_tts_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts-prefetch")
+
+# Story branches after part 1 are pregenerated here while the child reads part 1
+_story_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="story-prefetch")
+
+
+# Page styling, emitted on every run; built once per process
+_APP_CSS = """
+    <style>
+    /* Main app styling */
+    .main > div {
+        padding-top: 2rem;
+    }
+    
+    /* Header styling */
+    h1 {
+        color: #FF6B6B !important;
+        font-family: 'Comic Sans MS', cursive, sans-serif !important;
+        text-align: center !important;
+        font-size: 3rem !important;
+        margin-bottom: 0.5rem !important;
+    }
+    
+    /* Enhanced progress styling */
+    .progress-container {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        border-radius: 15px;
+        padding: 1rem;
+        margin: 1rem 0;
+        color: white;
+        text-align: center;
+    }
+    
+    /* Story content styling */
+    .story-content {
+        background: linear-gradient(135deg, #FFF9E6, #F0F8FF) !important;
+        border-radius: 20px !important;
+        padding: 2rem !important;
+        border: 3px solid #FFE66D !important;
+        margin: 1rem 0 !important;
+        font-size: 1.1rem !important;
+        line-height: 1.6 !important;
+    }
+    
+    /* Adventure header */
+    .adventure-header {
+        color: #FF6B6B !important;
+        font-family: 'Comic Sans MS', cursive, sans-serif !important;
+        text-align: center !important;
+        font-size: 2rem !important;
+        margin: 1rem 0 !important;
+    }
+    
+    /* Button styling */
+    .stButton > button {
+        background: linear-gradient(45deg, #FF6B6B, #FFE66D) !important;
+        border: none !important;
+        border-radius: 20px !important;
+        color: white !important;
+        font-weight: bold !important;
+        font-size: 1.2rem !important;
+        padding: 0.75rem 1.5rem !important;
+        box-shadow: 0 4px 15px rgba(0,0,0,0.2) !important;
+        transition: all 0.3s ease !important;
+    }
+    
+    .stButton > button:hover {
+        transform: translateY(-2px) !important;
+        box-shadow: 0 6px 20px rgba(0,0,0,0.3) !important;
+    }
+    
+    /* Primary button styling */
+    .stButton > button[kind="primary"] {
+        background: linear-gradient(45deg, #4ECDC4, #45B7B8) !important;
+        font-size: 1.4rem !important;
+        padding: 1rem 2rem !important;
+    }
+    </style>
+    """
+
+
+@st.cache_resource(show_spinner=False)
+def _get_story_generator(api_key_hash: str) -> MultiQuestionStoryGenerator:
+    """Story generator shared by every session, so its OpenAI connection pool is reused.
+    
+    Keyed on a hash of the API key, so the key itself never becomes a cache key.
+    """
+    return MultiQuestionStoryGenerator(os.getenv('OPENAI_API_KEY'), cache_path=STORY_CACHE_PATH)
+
 
 def initialize_session_state():
     """Initialize session state variables for multi-question stories."""
@@ -27,24 +125,77 @@ def initialize_session_state():
     if 'multi_story_generator' not in st.session_state:
         api_key = os.getenv('OPENAI_API_KEY')
         if api_key:
-            st.session_state.multi_story_generator = MultiQuestionStoryGenerator(api_key)
+            st.session_state.multi_story_generator = _get_story_generator(
+                hashlib.sha256(api_key.encode()).hexdigest()
+            )
     if 'current_question_start_time' not in st.session_state:
         st.session_state.current_question_start_time = None
     if 'waiting_for_answer' not in st.session_state:
         st.session_state.waiting_for_answer = False
+    if 'pending_tts' not in st.session_state:
+        st.session_state.pending_tts = {}  # Story text -> Future of its prefetched audio
+
+
+def _synthesize_mp3_to_disk(text: str, lang: str = "en", slow: bool = False) -> bytes:
+    """Synthesize text to MP3 bytes with gTTS, reusing audio saved by earlier runs.
+    
+    Touches no Streamlit state, so prefetch threads can call it directly.
+    """
+    digest = hashlib.sha1(f"{lang}\x1f{slow}\x1f{text}".encode()).hexdigest()
+    cache_path = os.path.join(TTS_CACHE_DIR, f"{digest}.mp3")
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as cached_file:
+            return cached_file.read()
+    
+    tts = gTTS(text=text, lang=lang, slow=slow)
+    audio_buffer = io.BytesIO()
+    tts.write_to_fp(audio_buffer)
+    audio_bytes = audio_buffer.getvalue()
+    
+    try:
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        # Write then rename, so a concurrent reader never sees a partial file
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as temp_file:
+            temp_file.write(audio_bytes)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass  # Disk cache is best effort; the in-memory cache still holds the audio
+    
+    return audio_bytes
+
+
+@st.cache_data(ttl=86400, max_entries=256, show_spinner=False)
+def _synthesize_mp3(text: str, lang: str = "en", slow: bool = False) -> bytes:
+    """In-memory cached narration for the script thread, backed by the disk cache."""
+    return _synthesize_mp3_to_disk(text, lang, slow)
 
 
 class TextToSpeechManager:
     """Simple TTS manager using gTTS for story narration."""
     
+    def prefetch_audio(self, text):
+        """Start synthesizing audio for text in the background, ahead of a Listen click."""
+        # Disk layer only: cache_data needs the script thread's ScriptRunContext
+        st.session_state.pending_tts[text] = _tts_prefetch_pool.submit(_synthesize_mp3_to_disk, text, "en", False)
+    
+    def discard_prefetched_audio(self):
+        """Forget prefetches for parts that were never played, cancelling any not yet started."""
+        for pending in st.session_state.get('pending_tts', {}).values():
+            pending.cancel()
+        st.session_state.pending_tts = {}
+    
     def create_audio_for_text(self, text):
         """Create audio from text using gTTS."""
+        pending = st.session_state.get('pending_tts', {}).pop(text, None)
+        if pending is not None:
+            # Wait for the prefetch rather than starting a second request for the same text
+            try:
+                return pending.result()
+            except Exception:
+                pass  # Failed or cancelled; synthesize directly below
         try:
-            tts = gTTS(text=text, lang='en', slow=False)
-            audio_buffer = io.BytesIO()
-            tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
-            return audio_buffer.getvalue()
+            return _synthesize_mp3(text, "en", False)
         except Exception as e:
             st.error(f"Audio generation failed: {e}")
             return None
@@ -85,6 +236,16 @@ class DrawingCanvas:
             return Image.fromarray(canvas_result.image_data.astype("uint8"), "RGBA")
         return None
     
+    def _flatten_for_saving(self, image: Image.Image) -> Image.Image:
+        """Composite onto white and reduce to a small palette; drawings are mostly flat color."""
+        if image.mode == "RGBA":
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        if image.mode == "RGB":
+            image = image.quantize(colors=64, method=Image.Quantize.FASTOCTREE)
+        return image
+    
     def save_child_artwork(self, image: Image.Image, child_name: str, story_theme: str) -> str:
         """Save child's artwork with metadata."""
         try:
@@ -96,7 +257,7 @@ class DrawingCanvas:
             os.makedirs("saved_artwork", exist_ok=True)
             
             filepath = os.path.join("saved_artwork", filename)
-            image.save(filepath)
+            self._flatten_for_saving(image).save(filepath, format="PNG", optimize=True, compress_level=9)
             
             return filepath
         except Exception as e:
@@ -104,6 +265,16 @@ class DrawingCanvas:
             return ""
 
 
+@st.cache_resource(show_spinner=False)
+def _get_tts_manager() -> TextToSpeechManager:
+    return TextToSpeechManager()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_drawing_canvas() -> DrawingCanvas:
+    return DrawingCanvas()
+
+
 def display_progress_indicator(session: StorySession):
     """Display progress indicator showing current question and difficulty."""
     if not session:
@@ -130,6 +301,28 @@ def display_progress_indicator(session: StorySession):
         st.markdown(f"**Difficulty: {difficulty_icon} {session.difficulty_level.name.title()}**")
 
 
+# Completed-part blocks; single-line HTML so several can share one markdown element
+_STORY_PART_HTML = (
+    '<div style="background: #f8f9fa; border-radius: 10px; padding: 1.5rem; border: 2px solid #dee2e6; '
+    'margin: 1rem 0; font-size: 1.1rem; line-height: 1.6; color: #212529;">{story}</div>'
+)
+_QUESTION_HTML = (
+    '<div style="background: #e8f4f8; padding: 1rem; border-radius: 8px; border-left: 4px solid #17a2b8; '
+    'margin: 0.5rem 0; color: #0c5460;"><strong>Question:</strong> {question}</div>'
+)
+_CORRECT_ANSWER_HTML = (
+    '<div style="background: #d4edda; padding: 1rem; border-radius: 8px; border-left: 4px solid #28a745; '
+    'margin: 0.5rem 0; color: #155724;"><strong>Your Answer:</strong> {user_answer} ✅<br>'
+    '<strong>Result:</strong> Correct! Great job! 🌟</div>'
+)
+_INCORRECT_ANSWER_HTML = (
+    '<div style="background: #f8d7da; padding: 1rem; border-radius: 8px; border-left: 4px solid #dc3545; '
+    'margin: 0.5rem 0; color: #721c24;"><strong>Your Answer:</strong> {user_answer}<br>'
+    '<strong>Correct Answer:</strong> {correct_answer}<br>'
+    '<strong>Result:</strong> Good try! Keep learning! 💪</div>'
+)
+
+
 def display_completed_parts_with_qa(session: StorySession, tts_manager=None):
     """Display completed story parts with their questions and answers."""
     if not session or not session.story_parts:
@@ -145,75 +338,32 @@ def display_completed_parts_with_qa(session: StorySession, tts_manager=None):
         if i < len(session.question_results):
             result = session.question_results[i]
             
-            st.markdown(f"---")
-            st.markdown(f"## 🏰 Part {part_num}")
-            
-            # Story part
-            st.markdown(f'''
-            <div style="
-                background: #f8f9fa;
-                border-radius: 10px;
-                padding: 1.5rem;
-                border: 2px solid #dee2e6;
-                margin: 1rem 0;
-                font-size: 1.1rem;
-                line-height: 1.6;
-                color: #212529;
-            ">
-                {part.replace(chr(10), "<br>")}
-            </div>
-            ''', unsafe_allow_html=True)
+            # Header and story in one element
+            st.markdown(
+                f"---\n\n## 🏰 Part {part_num}\n\n"
+                + _STORY_PART_HTML.format(story=part.replace("\n", "<br>")),
+                unsafe_allow_html=True
+            )
             
             # Add individual TTS button for this part (on-demand)
             if tts_manager:
                 if st.button(f"🎵 Listen to Part {part_num}", key=f"tts_part_{part_num}"):
                     tts_manager.create_audio_player(part, f"🎵 Part {part_num} Audio")
             
-            # Question and answer section
-            st.markdown("#### 🤔 The Challenge:")
-            st.markdown(f'''
-            <div style="
-                background: #e8f4f8;
-                padding: 1rem;
-                border-radius: 8px;
-                border-left: 4px solid #17a2b8;
-                margin: 0.5rem 0;
-                color: #0c5460;
-            ">
-                <strong>Question:</strong> {result.question_text}
-            </div>
-            ''', unsafe_allow_html=True)
-            
-            # Show answer with success/failure styling
+            # Question and answer with success/failure styling, in one element
             if result.is_correct:
-                st.markdown(f'''
-                <div style="
-                    background: #d4edda;
-                    padding: 1rem;
-                    border-radius: 8px;
-                    border-left: 4px solid #28a745;
-                    margin: 0.5rem 0;
-                    color: #155724;
-                ">
-                    <strong>Your Answer:</strong> {result.user_answer} ✅<br>
-                    <strong>Result:</strong> Correct! Great job! 🌟
-                </div>
-                ''', unsafe_allow_html=True)
+                answer_html = _CORRECT_ANSWER_HTML.format(user_answer=result.user_answer)
             else:
-                st.markdown(f'''
-                <div style="
-                    background: #f8d7da;
-                    padding: 1rem;
-                    border-radius: 8px;
-                    border-left: 4px solid #dc3545;
-                    margin: 0.5rem 0;
-                    color: #721c24;
-                ">
-                    <strong>Your Answer:</strong> {result.user_answer}<br>
-                    <strong>Correct Answer:</strong> {result.correct_answer}<br>
-                    <strong>Result:</strong> Good try! Keep learning! 💪
-                </div>
-                ''', unsafe_allow_html=True)
+                answer_html = _INCORRECT_ANSWER_HTML.format(
+                    user_answer=result.user_answer, correct_answer=result.correct_answer
+                )
+            st.markdown(
+                "#### 🤔 The Challenge:\n\n"
+                + _QUESTION_HTML.format(question=result.question_text)
+                + "\n"
+                + answer_html,
+                unsafe_allow_html=True
+            )
             
             # Show explanation in an expandable section
             with st.expander(f"💡 Learning Explanation for Part {part_num}"):
@@ -430,6 +580,51 @@ def display_story_completion(session: StorySession):
             st.markdown("*Building skills step by step*")
 
 
+@st.fragment
+def display_drawing_section(session: StorySession, drawing_canvas: DrawingCanvas):
+    """Drawing canvas and save button, rerun on their own so strokes don't redraw the whole page."""
+    st.markdown("")
+    st.markdown('<div class="adventure-header">🎨 Draw Your Adventure! 🎨</div>', unsafe_allow_html=True)
+    
+    # Create drawing prompt based on theme and child name
+    child_name_canvas = session.child_name
+    theme = session.theme
+    drawing_prompt = f"Draw your favorite scene from {child_name_canvas}'s complete {theme} adventure!"
+    
+    # Drawing canvas with styled container
+    st.markdown(f'''
+    <div style="
+        background: linear-gradient(135deg, #fa709a 0%, #fee140 100%);
+        padding: 2rem;
+        border-radius: 20px;
+        color: white;
+        margin: 1rem 0;
+        box-shadow: 0 8px 32px rgba(0,0,0,0.1);
+    ">
+        <h2 style="color: white; margin-bottom: 1rem; text-align: center; font-size: 2rem;">
+            ✏️ Time to Create Your Masterpiece! ✏️
+        </h2>
+    </div>
+    ''', unsafe_allow_html=True)
+    
+    # Create the drawing canvas
+    child_drawing = drawing_canvas.create_drawing_canvas(drawing_prompt, width=600, height=400)
+    
+    # Save artwork button
+    if child_drawing is not None:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            if st.button("💾 Save My Amazing Artwork! 💾", use_container_width=True, key="save_artwork"):
+                filepath = drawing_canvas.save_child_artwork(child_drawing, child_name_canvas, theme)
+                if filepath:
+                    st.success(f"🎉 Your incredible artwork has been saved! You're such a talented artist, {child_name_canvas}! 🎨")
+                    st.balloons()
+                    # Show a preview of the saved image (the small palette PNG, not the raw canvas)
+                    st.image(filepath, caption=f"{child_name_canvas}'s {theme} Adventure Art", use_container_width=True)
+                else:
+                    st.error("😔 Oops! We couldn't save your artwork right now. But it looks amazing!")
+
+
 def create_new_story_session():
     """Create a new multi-question story session."""
     if ('theme' in st.session_state and 'child_name' in st.session_state and 
@@ -443,6 +638,7 @@ def create_new_story_session():
         )
         
         st.session_state.story_session = session
+        _get_tts_manager().discard_prefetched_audio()
         st.session_state.waiting_for_answer = False
         st.session_state.current_question_start_time = time.time()
         
@@ -458,78 +654,7 @@ def main():
     )
     
     # Custom CSS for enhanced interface
-    st.markdown("""
-    <style>
-    /* Main app styling */
-    .main > div {
-        padding-top: 2rem;
-    }
-    
-    /* Header styling */
-    h1 {
-        color: #FF6B6B !important;
-        font-family: 'Comic Sans MS', cursive, sans-serif !important;
-        text-align: center !important;
-        font-size: 3rem !important;
-        margin-bottom: 0.5rem !important;
-    }
-    
-    /* Enhanced progress styling */
-    .progress-container {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        border-radius: 15px;
-        padding: 1rem;
-        margin: 1rem 0;
-        color: white;
-        text-align: center;
-    }
-    
-    /* Story content styling */
-    .story-content {
-        background: linear-gradient(135deg, #FFF9E6, #F0F8FF) !important;
-        border-radius: 20px !important;
-        padding: 2rem !important;
-        border: 3px solid #FFE66D !important;
-        margin: 1rem 0 !important;
-        font-size: 1.1rem !important;
-        line-height: 1.6 !important;
-    }
-    
-    /* Adventure header */
-    .adventure-header {
-        color: #FF6B6B !important;
-        font-family: 'Comic Sans MS', cursive, sans-serif !important;
-        text-align: center !important;
-        font-size: 2rem !important;
-        margin: 1rem 0 !important;
-    }
-    
-    /* Button styling */
-    .stButton > button {
-        background: linear-gradient(45deg, #FF6B6B, #FFE66D) !important;
-        border: none !important;
-        border-radius: 20px !important;
-        color: white !important;
-        font-weight: bold !important;
-        font-size: 1.2rem !important;
-        padding: 0.75rem 1.5rem !important;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.2) !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px) !important;
-        box-shadow: 0 6px 20px rgba(0,0,0,0.3) !important;
-    }
-    
-    /* Primary button styling */
-    .stButton > button[kind="primary"] {
-        background: linear-gradient(45deg, #4ECDC4, #45B7B8) !important;
-        font-size: 1.4rem !important;
-        padding: 1rem 2rem !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(_APP_CSS, unsafe_allow_html=True)
     
     st.markdown('<h1>🏰 Ainia Adventure Stories!</h1>', unsafe_allow_html=True)
     st.markdown('<h3>✨ Create your own magical adventure story! ✨</h3>', unsafe_allow_html=True)
@@ -543,9 +668,9 @@ def main():
         st.error("🔑 **API Key Missing!** Please set up your OpenAI API key to continue.")
         st.stop()
     
-    # Initialize managers
-    tts_manager = TextToSpeechManager()
-    drawing_canvas = DrawingCanvas()
+    # Initialize managers (stateless, so one instance serves every rerun)
+    tts_manager = _get_tts_manager()
+    drawing_canvas = _get_drawing_canvas()
     
     # Check if we have an active story session (including completed ones)
     if st.session_state.story_session is not None:
@@ -571,6 +696,17 @@ def main():
                 session.story_parts.append(story_part)
                 session.questions.append(question_data)
                 
+                # Narration is ready by the time the child presses Listen
+                if story_part:
+                    tts_manager.prefetch_audio(story_part)
+                
+                # Every later part and answer branch in one background request; parts
+                # needed before it finishes are generated one at a time as usual
+                if questions_answered == 0:
+                    _story_prefetch_pool.submit(
+                        st.session_state.multi_story_generator.pregenerate_adventure_tree, session
+                    )
+                
                 st.session_state.current_question_start_time = time.time()
                 st.session_state.waiting_for_answer = True
                 st.rerun()
@@ -591,46 +727,7 @@ def main():
             display_story_completion(session)
             
             # Drawing Canvas Section (only after completion)
-            st.markdown("")
-            st.markdown('<div class="adventure-header">🎨 Draw Your Adventure! 🎨</div>', unsafe_allow_html=True)
-            
-            # Create drawing prompt based on theme and child name
-            child_name_canvas = session.child_name
-            theme = session.theme
-            drawing_prompt = f"Draw your favorite scene from {child_name_canvas}'s complete {theme} adventure!"
-            
-            # Drawing canvas with styled container
-            st.markdown(f'''
-            <div style="
-                background: linear-gradient(135deg, #fa709a 0%, #fee140 100%);
-                padding: 2rem;
-                border-radius: 20px;
-                color: white;
-                margin: 1rem 0;
-                box-shadow: 0 8px 32px rgba(0,0,0,0.1);
-            ">
-                <h2 style="color: white; margin-bottom: 1rem; text-align: center; font-size: 2rem;">
-                    ✏️ Time to Create Your Masterpiece! ✏️
-                </h2>
-            </div>
-            ''', unsafe_allow_html=True)
-            
-            # Create the drawing canvas
-            child_drawing = drawing_canvas.create_drawing_canvas(drawing_prompt, width=600, height=400)
-            
-            # Save artwork button
-            if child_drawing is not None:
-                col1, col2, col3 = st.columns([1, 2, 1])
-                with col2:
-                    if st.button("💾 Save My Amazing Artwork! 💾", use_container_width=True, key="save_artwork"):
-                        filepath = drawing_canvas.save_child_artwork(child_drawing, child_name_canvas, theme)
-                        if filepath:
-                            st.success(f"🎉 Your incredible artwork has been saved! You're such a talented artist, {child_name_canvas}! 🎨")
-                            st.balloons()
-                            # Show a preview of the saved image
-                            st.image(child_drawing, caption=f"{child_name_canvas}'s {theme} Adventure Art", use_container_width=True)
-                        else:
-                            st.error("😔 Oops! We couldn't save your artwork right now. But it looks amazing!")
+            display_drawing_section(session, drawing_canvas)
             
             st.markdown("") # Spacer
             
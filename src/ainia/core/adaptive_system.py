@@ -1,11 +1,22 @@
 """Advanced Personalization & Learning Adaptation System for Ainia Adventure Stories."""
 
 import json
+import re
+import string
+import sys
 import time
 import hashlib
+import heapq
+import os
+import threading
+import weakref
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
-from enum import Enum
+from dataclasses import dataclass
+from enum import Enum, IntEnum
+from collections import Counter, deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice, product
 
 
 class LearningStyle(Enum):
@@ -16,7 +27,7 @@ class LearningStyle(Enum):
     MIXED = "mixed"
 
 
-class DifficultyLevel(Enum):
+class DifficultyLevel(IntEnum):
     """Dynamic difficulty levels."""
     BEGINNER = 1
     INTERMEDIATE = 2
@@ -24,7 +35,11 @@ class DifficultyLevel(Enum):
     EXPERT = 4
 
 
-@dataclass
+# Indexed by level number, so adjustments skip the Enum constructor lookup
+_DIFFICULTY_BY_LEVEL = (None,) + tuple(DifficultyLevel)
+
+
+@dataclass(slots=True)
 class LearningMetrics:
     """Tracks learning progress and engagement metrics."""
     reading_speed_wpm: float = 0.0
@@ -35,6 +50,10 @@ class LearningMetrics:
     vocabulary_level: int = 1
     math_level: int = 1
     problem_solving_level: int = 1
+    
+    def to_dict(self) -> Dict:
+        """Field values as a new dict; every field is a plain number, so no deep copy is needed."""
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
 @dataclass
@@ -46,21 +65,133 @@ class ChildProfile:
     difficulty_level: DifficultyLevel = DifficultyLevel.BEGINNER
     preferred_themes: List[str] = None
     learning_metrics: LearningMetrics = None
-    interaction_history: List[Dict] = None
+    interaction_history: deque = None  # Most recent HISTORY_LIMIT interactions, oldest first
     achievements: List[str] = None
     last_updated: float = None
+    interest_graph: Dict[str, float] = None  # Theme -> interest weight, stored divided by interest_scale
+    interest_scale: float = 1.0  # Decay shared by every theme, applied when weights are read
+    version: int = 0  # Bumped on every update; code changing a profile outside the manager must bump it too
+    
+    HISTORY_LIMIT = 512  # Older interactions survive only in the learning metrics and running totals below
+    EARLY_OUTCOME_LIMIT = 5  # How many of the first interactions keep their outcome
     
     def __post_init__(self):
         if self.preferred_themes is None:
             self.preferred_themes = []
         if self.learning_metrics is None:
             self.learning_metrics = LearningMetrics()
-        if self.interaction_history is None:
-            self.interaction_history = []
+        history = self.interaction_history or ()
+        self.interaction_history = deque(maxlen=self.HISTORY_LIMIT)
+        # Lowercased response of each interaction in the history, in the same order
+        self.lowercase_responses = deque(maxlen=self.HISTORY_LIMIT)
         if self.achievements is None:
             self.achievements = []
         if self.last_updated is None:
             self.last_updated = time.time()
+        if self.interest_graph is None:
+            self.interest_graph = {}
+        
+        # Running interaction/success counts by theme, learning focus and both
+        self._outcome_totals = Counter()
+        self._outcome_successes = Counter()
+        # Whole-history facts for reports, kept after the interactions leave the history
+        self.interaction_count = 0
+        self.first_interaction_timestamp = None
+        self.total_session_duration = 0.0
+        self.early_outcomes = []  # 'correct' flags of the first EARLY_OUTCOME_LIMIT interactions
+        for interaction in history:
+            self.record_interaction(interaction)
+    
+    def interest_weights(self) -> Dict[str, float]:
+        """Current interest weight of every theme, with pending decay applied."""
+        scale = self.interest_scale
+        return {theme: weight * scale for theme, weight in self.interest_graph.items()}
+    
+    def record_interaction(self, interaction: Dict):
+        """Append an interaction to the history and fold it into the outcome counts and totals."""
+        if not self.interaction_count:
+            self.first_interaction_timestamp = interaction.get('timestamp')
+        if len(self.early_outcomes) < self.EARLY_OUTCOME_LIMIT:
+            self.early_outcomes.append(interaction.get('correct', False))
+        self.interaction_count += 1
+        self.total_session_duration += interaction.get('session_duration', 8)
+        self.interaction_history.append(interaction)
+        self.lowercase_responses.append(interaction.get('response', '').lower())
+        self._tally_outcome(interaction)
+    
+    def _tally_outcome(self, interaction: Dict):
+        theme = _intern_key(interaction.get('theme'))
+        learning_focus = _intern_key(interaction.get('learning_focus'))
+        keys = (('theme', theme), ('focus', learning_focus), ('both', theme, learning_focus))
+        self._outcome_totals.update(keys)
+        if interaction.get('correct', False):
+            self._outcome_successes.update(keys)
+    
+    def success_rate_for(self, theme: str, learning_focus: str) -> Optional[float]:
+        """Success rate over interactions with this theme or this focus, None if there are none."""
+        keys = (('theme', theme), ('focus', learning_focus), ('both', theme, learning_focus))
+        # Inclusion-exclusion, so interactions matching both are counted once
+        relevant = self._outcome_totals[keys[0]] + self._outcome_totals[keys[1]] - self._outcome_totals[keys[2]]
+        if not relevant:
+            return None
+        successful = (self._outcome_successes[keys[0]] + self._outcome_successes[keys[1]]
+                      - self._outcome_successes[keys[2]])
+        return successful / relevant
+
+
+def _recent_interactions(history, count: int) -> List[Dict]:
+    """Return the last count interactions, oldest first, without copying the whole history."""
+    tail = list(islice(reversed(history), count))
+    tail.reverse()
+    return tail
+
+
+def _engagement_table() -> Dict[Tuple[bool, bool, bool], float]:
+    """Engagement score for every (completed, good response quality, long session) combination."""
+    table = {}
+    for factors in product((False, True), repeat=3):
+        score = 0.0
+        for weight, present in zip((0.4, 0.3, 0.3), factors):
+            if present:
+                score += weight
+        table[factors] = score
+    return table
+
+
+_ENGAGEMENT_BY_FACTORS = _engagement_table()
+
+
+def _intern_key(value):
+    """Intern theme/focus strings from interaction data before they become long-lived dict keys.
+
+    Literal names in this module are already interned by the compiler, so lookups with
+    them can then match by identity.
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+# Skills checked for learning gaps, and how far below the child's age each level may sit
+_SKILL_NAMES = ('math', 'vocabulary', 'problem_solving')
+_SKILL_AGE_OFFSETS = (3, 4, 4)
+
+# Turns punctuation into spaces before text is split into words, so "dragon's" keeps "dragon"
+_PUNCT_TABLE = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+
+# Theme-specific vocabulary keyed by (theme, vocabulary level)
+_THEME_VOCAB = {
+    ('dragons', 1): ('fire', 'cave', 'gold'),
+    ('dragons', 2): ('dragon', 'treasure', 'castle'),
+    ('dragons', 3): ('magnificent', 'breathe fire', 'guardian'),
+    ('dragons', 4): ('majestic', 'legendary', 'protective'),
+    ('pirates', 1): ('ship', 'sea', 'gold'),
+    ('pirates', 2): ('pirate', 'treasure', 'island'),
+    ('pirates', 3): ('adventure', 'navigation', 'courage'),
+    ('pirates', 4): ('expedition', 'cartographer', 'mariner'),
+    ('princesses', 1): ('crown', 'dress', 'nice'),
+    ('princesses', 2): ('princess', 'castle', 'kingdom'),
+    ('princesses', 3): ('royal', 'wisdom', 'leadership'),
+    ('princesses', 4): ('diplomacy', 'benevolent', 'governance'),
+}
 
 
 class DynamicDifficultyAdjuster:
@@ -80,11 +211,11 @@ class DynamicDifficultyAdjuster:
             return profile.difficulty_level
         
         # Calculate recent performance metrics
-        recent_success_rate = self._calculate_success_rate(recent_interactions[-5:])
-        avg_response_time = self._calculate_avg_response_time(recent_interactions[-5:])
-        engagement_level = self._calculate_engagement_level(recent_interactions[-3:])
+        recent_success_rate, avg_response_time, engagement_level = self._summarize_recent(
+            _recent_interactions(recent_interactions, 5)
+        )
         
-        current_level = profile.difficulty_level.value
+        current_level = profile.difficulty_level
         
         # Difficulty adjustment logic
         if (recent_success_rate > self.difficulty_thresholds['success_rate_up'] and 
@@ -98,111 +229,97 @@ class DynamicDifficultyAdjuster:
             new_level = max(1, current_level - 1)
         else:
             # Maintain current difficulty
-            new_level = current_level
+            return current_level
         
-        return DifficultyLevel(new_level)
+        return _DIFFICULTY_BY_LEVEL[new_level]
     
-    def _calculate_success_rate(self, interactions: List[Dict]) -> float:
-        """Calculate success rate from recent interactions."""
-        if not interactions:
-            return 0.5
-        
-        successes = sum(1 for interaction in interactions if interaction.get('correct', False))
-        return successes / len(interactions)
-    
-    def _calculate_avg_response_time(self, interactions: List[Dict]) -> float:
-        """Calculate average response time."""
-        if not interactions:
-            return 15.0
+    def _summarize_recent(self, interactions: List[Dict]) -> Tuple[float, float, float]:
+        """Success rate and average response time over the window, engagement over its last 3.
         
-        times = [interaction.get('response_time', 15.0) for interaction in interactions]
-        return sum(times) / len(times)
-    
-    def _calculate_engagement_level(self, interactions: List[Dict]) -> float:
-        """Calculate engagement level based on various factors."""
+        All three come from a single pass over the window.
+        """
         if not interactions:
-            return 0.5
+            return 0.5, 15.0, 0.5
         
-        # Engagement factors: completion, response quality, session duration
+        successes = 0
+        response_times = []
         engagement_scores = []
-        for interaction in interactions:
-            score = 0.0
-            if interaction.get('completed', False):
-                score += 0.4
-            if interaction.get('response_quality', 0) > 0.5:
-                score += 0.3
-            if interaction.get('session_duration', 0) > 300:  # 5+ minutes
-                score += 0.3
-            engagement_scores.append(score)
-        
-        return sum(engagement_scores) / len(engagement_scores)
+        engagement_start = len(interactions) - 3
+        for index, interaction in enumerate(interactions):
+            if interaction.get('correct', False):
+                successes += 1
+            response_times.append(interaction.get('response_time', 15.0))
+            if index >= engagement_start:
+                engagement_scores.append(self._engagement_score(interaction))
+        
+        count = len(interactions)
+        return (successes / count, sum(response_times) / count,
+                sum(engagement_scores) / len(engagement_scores))
+    
+    def _engagement_score(self, interaction: Dict) -> float:
+        """Engagement factors: completion, response quality, session duration."""
+        return _ENGAGEMENT_BY_FACTORS[(
+            bool(interaction.get('completed', False)),
+            interaction.get('response_quality', 0) > 0.5,
+            interaction.get('session_duration', 0) > 300  # 5+ minutes
+        )]
 
 
 class AdaptiveVocabularySystem:
     """Adaptive vocabulary introduction based on comprehension."""
     
-    def __init__(self):
-        self.vocabulary_levels = {
-            1: {  # Ages 5-6
-                'words': ['big', 'small', 'happy', 'sad', 'run', 'jump', 'red', 'blue'],
-                'complexity': 'simple',
-                'syllables': 1
-            },
-            2: {  # Ages 6-7
-                'words': ['adventure', 'treasure', 'magical', 'courage', 'friendship', 'explore'],
-                'complexity': 'moderate',
-                'syllables': 2
-            },
-            3: {  # Ages 7-8
-                'words': ['magnificent', 'mysterious', 'challenge', 'determined', 'discovery'],
-                'complexity': 'intermediate',
-                'syllables': 3
-            },
-            4: {  # Ages 8-9
-                'words': ['extraordinary', 'magnificent', 'perseverance', 'imagination', 'accomplishment'],
-                'complexity': 'advanced',
-                'syllables': 4
-            }
+    _VOCABULARY_LEVELS = {
+        1: {  # Ages 5-6
+            'words': ('big', 'small', 'happy', 'sad', 'run', 'jump', 'red', 'blue'),
+            'complexity': 'simple',
+            'syllables': 1
+        },
+        2: {  # Ages 6-7
+            'words': ('adventure', 'treasure', 'magical', 'courage', 'friendship', 'explore'),
+            'complexity': 'moderate',
+            'syllables': 2
+        },
+        3: {  # Ages 7-8
+            'words': ('magnificent', 'mysterious', 'challenge', 'determined', 'discovery'),
+            'complexity': 'intermediate',
+            'syllables': 3
+        },
+        4: {  # Ages 8-9
+            'words': ('extraordinary', 'magnificent', 'perseverance', 'imagination', 'accomplishment'),
+            'complexity': 'advanced',
+            'syllables': 4
         }
+    }
     
     def get_appropriate_vocabulary(self, profile: ChildProfile, theme: str) -> List[str]:
         """Get age and skill-appropriate vocabulary for story."""
         vocab_level = min(4, max(1, int(profile.learning_metrics.vocabulary_level)))
         theme_words = self._get_theme_vocabulary(theme, vocab_level)
-        base_words = self.vocabulary_levels[vocab_level]['words']
+        base_words = self._VOCABULARY_LEVELS[vocab_level]['words']
         
-        return theme_words + base_words[:3]  # Limit to prevent overwhelm
+        return list(theme_words + base_words[:3])  # Limit to prevent overwhelm
     
-    def _get_theme_vocabulary(self, theme: str, level: int) -> List[str]:
+    def _get_theme_vocabulary(self, theme: str, level: int) -> Tuple[str, ...]:
         """Get theme-specific vocabulary at appropriate level."""
-        theme_vocab = {
-            'dragons': {
-                1: ['fire', 'cave', 'gold'],
-                2: ['dragon', 'treasure', 'castle'],
-                3: ['magnificent', 'breathe fire', 'guardian'],
-                4: ['majestic', 'legendary', 'protective']
-            },
-            'pirates': {
-                1: ['ship', 'sea', 'gold'],
-                2: ['pirate', 'treasure', 'island'],
-                3: ['adventure', 'navigation', 'courage'],
-                4: ['expedition', 'cartographer', 'mariner']
-            },
-            'princesses': {
-                1: ['crown', 'dress', 'nice'],
-                2: ['princess', 'castle', 'kingdom'],
-                3: ['royal', 'wisdom', 'leadership'],
-                4: ['diplomacy', 'benevolent', 'governance']
-            }
-        }
-        
-        return theme_vocab.get(theme, {}).get(level, [])
+        return _THEME_VOCAB.get((theme, level), ())
     
     def assess_vocabulary_comprehension(self, response: str, target_words: List[str]) -> float:
         """Assess how well child understood vocabulary."""
-        response_lower = response.lower()
-        understood_words = sum(1 for word in target_words if word.lower() in response_lower)
-        return understood_words / len(target_words) if target_words else 1.0
+        if not target_words:
+            return 1.0
+        # Whole-word matching, so "sad" no longer counts inside "saddle"
+        words = response.lower().translate(_PUNCT_TABLE).split()
+        response_tokens = set(words)
+        padded_response = f" {' '.join(words)} "
+        understood_words = 0
+        for target in target_words:
+            # Targets are tokenized the same way, so multi-word targets match the token sequence
+            target_tokens = target.lower().translate(_PUNCT_TABLE).split()
+            if len(target_tokens) > 1:
+                understood_words += f" {' '.join(target_tokens)} " in padded_response
+            elif target_tokens:
+                understood_words += target_tokens[0] in response_tokens
+        return understood_words / len(target_words)
 
 
 class LearningStyleDetector:
@@ -212,26 +329,32 @@ class LearningStyleDetector:
         self.visual_indicators = ['picture', 'see', 'look', 'color', 'bright', 'image']
         self.auditory_indicators = ['hear', 'sound', 'listen', 'music', 'voice', 'loud']
         self.kinesthetic_indicators = ['move', 'touch', 'feel', 'action', 'do', 'play']
+        
+        # One scan per response finds every indicator; each maps back to its style
+        self._indicator_styles = {}
+        for style, indicators in (('visual', self.visual_indicators),
+                                  ('auditory', self.auditory_indicators),
+                                  ('kinesthetic', self.kinesthetic_indicators)):
+            for indicator in indicators:
+                self._indicator_styles[indicator] = style
+        alternation = '|'.join(map(re.escape, sorted(self._indicator_styles, key=len, reverse=True)))
+        # Zero-width lookahead so overlapping indicators are all found, like substring checks
+        self._indicator_pattern = re.compile(f'(?=({alternation}))')
     
     def detect_learning_style(self, profile: ChildProfile) -> LearningStyle:
         """Detect learning style from interaction history."""
         if not profile.interaction_history:
             return LearningStyle.MIXED
         
-        visual_score = 0
-        auditory_score = 0
-        kinesthetic_score = 0
+        scores = {'visual': 0, 'auditory': 0, 'kinesthetic': 0}
         
-        for interaction in profile.interaction_history[-10:]:  # Analyze last 10 interactions
-            response = interaction.get('response', '').lower()
-            
-            # Count indicators
-            visual_score += sum(1 for indicator in self.visual_indicators if indicator in response)
-            auditory_score += sum(1 for indicator in self.auditory_indicators if indicator in response)
-            kinesthetic_score += sum(1 for indicator in self.kinesthetic_indicators if indicator in response)
+        # Analyze last 10 interactions; responses were lowercased once when recorded
+        for response in _recent_interactions(profile.lowercase_responses, 10):
+            # Count indicators (each distinct indicator once per response)
+            for indicator in set(self._indicator_pattern.findall(response)):
+                scores[self._indicator_styles[indicator]] += 1
         
         # Determine dominant style
-        scores = {'visual': visual_score, 'auditory': auditory_score, 'kinesthetic': kinesthetic_score}
         max_score = max(scores.values())
         
         if max_score == 0:
@@ -256,32 +379,36 @@ class InterestGraphBuilder:
     
     def update_interest_graph(self, profile: ChildProfile, theme: str, engagement_score: float):
         """Update interest graph based on interaction."""
-        if not hasattr(profile, 'interest_graph'):
-            profile.interest_graph = {}
-        
-        current_weight = profile.interest_graph.get(theme, 0.0)
+        theme = _intern_key(theme)
+        graph = profile.interest_graph
+        current_weight = graph.get(theme, 0.0) * profile.interest_scale
         # Update weight based on engagement (higher engagement = higher interest)
         new_weight = (current_weight * 0.8) + (engagement_score * 0.2)
-        profile.interest_graph[theme] = new_weight
         
-        # Apply decay to other themes to prioritize recent preferences
-        for other_theme in profile.interest_graph:
-            if other_theme != theme:
-                profile.interest_graph[other_theme] *= self.interest_decay_factor
+        # Decay every theme at once through the shared scale to prioritize recent preferences;
+        # the updated theme is stored against the new scale, so it is not decayed itself
+        profile.interest_scale *= self.interest_decay_factor
+        graph[theme] = new_weight / profile.interest_scale
+        
+        # Fold the scale back into the weights before the stored values grow too large
+        if profile.interest_scale < 1e-6:
+            for other_theme in graph:
+                graph[other_theme] *= profile.interest_scale
+            profile.interest_scale = 1.0
     
     def get_recommended_themes(self, profile: ChildProfile, num_recommendations: int = 3) -> List[str]:
         """Get theme recommendations based on interest graph."""
-        if not hasattr(profile, 'interest_graph') or not profile.interest_graph:
+        if not profile.interest_graph:
             return ['dragons', 'pirates', 'princesses']  # Default themes
         
-        # Sort themes by interest weight
-        sorted_themes = sorted(
+        # Highest interest weights first; the shared scale does not change the order
+        top_themes = heapq.nlargest(
+            num_recommendations,
             profile.interest_graph.items(),
-            key=lambda x: x[1],
-            reverse=True
+            key=lambda x: x[1]
         )
         
-        return [theme for theme, _ in sorted_themes[:num_recommendations]]
+        return [theme for theme, _ in top_themes]
 
 
 class RecommendationEngine:
@@ -296,90 +423,79 @@ class RecommendationEngine:
     
     def generate_recommendations(self, profile: ChildProfile) -> List[Dict]:
         """Generate personalized story recommendations."""
-        recommendations = []
-        
         # Identify learning gaps
         learning_gaps = self._identify_learning_gaps(profile)
+        gaps_set = frozenset(learning_gaps)
         
         # Get preferred themes
         interest_builder = InterestGraphBuilder()
         preferred_themes = interest_builder.get_recommended_themes(profile)
         
-        # Generate recommendations addressing gaps with preferred themes
-        for gap in learning_gaps[:3]:  # Top 3 gaps
-            for theme in preferred_themes[:2]:  # Top 2 themes
-                recommendation = {
-                    'theme': theme,
-                    'learning_focus': gap,
-                    'difficulty_level': profile.difficulty_level.value,
-                    'reason': f"Strengthen {gap} skills with {theme} adventures",
-                    'estimated_duration': self._estimate_duration(profile, gap),
-                    'confidence_score': self._calculate_confidence_score(profile, theme, gap)
-                }
-                recommendations.append(recommendation)
-        
-        # Sort by confidence score
-        recommendations.sort(key=lambda x: x['confidence_score'], reverse=True)
-        return recommendations[:5]  # Return top 5 recommendations
+        # Score every gap/theme pair first; duration and difficulty are the same for all of them
+        candidates = [
+            (gap, theme, self._calculate_confidence_score(profile, theme, gap, gaps_set))
+            for gap in learning_gaps[:3]  # Top 3 gaps
+            for theme in preferred_themes[:2]  # Top 2 themes
+        ]
+        estimated_duration = self._estimate_duration(profile)
+        difficulty_level = profile.difficulty_level.value
+        
+        # Build dicts only for the top 5 recommendations by confidence score
+        return [
+            {
+                'theme': theme,
+                'learning_focus': gap,
+                'difficulty_level': difficulty_level,
+                'reason': f"Strengthen {gap} skills with {theme} adventures",
+                'estimated_duration': estimated_duration,
+                'confidence_score': confidence_score
+            }
+            for gap, theme, confidence_score in heapq.nlargest(5, candidates, key=lambda x: x[2])
+        ]
     
     def _identify_learning_gaps(self, profile: ChildProfile) -> List[str]:
         """Identify areas where child needs more practice."""
-        gaps = []
         metrics = profile.learning_metrics
+        levels = (metrics.math_level, metrics.vocabulary_level, metrics.problem_solving_level)
         
-        # Check math skills
-        if metrics.math_level < profile.age - 3:  # Behind expected level
-            gaps.append('math')
-        
-        # Check vocabulary skills
-        if metrics.vocabulary_level < profile.age - 4:
-            gaps.append('vocabulary')
-        
-        # Check problem solving
-        if metrics.problem_solving_level < profile.age - 4:
-            gaps.append('problem_solving')
+        # Skills behind the level expected for the child's age
+        gaps = [
+            skill for skill, level, offset in zip(_SKILL_NAMES, levels, _SKILL_AGE_OFFSETS)
+            if level < profile.age - offset
+        ]
         
-        # If no gaps, focus on strengths for continued growth
+        # If no gaps, focus on strengths for continued growth (ties go to the earlier skill)
         if not gaps:
-            if metrics.math_level >= metrics.vocabulary_level and metrics.math_level >= metrics.problem_solving_level:
-                gaps.append('math')
-            elif metrics.vocabulary_level >= metrics.problem_solving_level:
-                gaps.append('vocabulary')
-            else:
-                gaps.append('problem_solving')
+            gaps.append(_SKILL_NAMES[levels.index(max(levels))])
         
         return gaps
     
-    def _estimate_duration(self, profile: ChildProfile, learning_focus: str) -> int:
-        """Estimate story duration in minutes."""
+    def _estimate_duration(self, profile: ChildProfile) -> int:
+        """Estimate story duration in minutes (depends on the child, not the learning focus)."""
         base_duration = 8  # Base 8 minutes
         
         # Adjust based on age and difficulty
         age_factor = (profile.age - 4) * 1.5
-        difficulty_factor = profile.difficulty_level.value * 2
+        difficulty_factor = profile.difficulty_level * 2
         
         return int(base_duration + age_factor + difficulty_factor)
     
-    def _calculate_confidence_score(self, profile: ChildProfile, theme: str, learning_focus: str) -> float:
+    def _calculate_confidence_score(self, profile: ChildProfile, theme: str, learning_focus: str,
+                                    gaps: frozenset) -> float:
         """Calculate confidence score for recommendation."""
         score = 0.5  # Base score
         
         # Theme preference boost
-        if hasattr(profile, 'interest_graph') and theme in profile.interest_graph:
-            score += profile.interest_graph[theme] * 0.3
+        if theme in profile.interest_graph:
+            score += profile.interest_graph[theme] * profile.interest_scale * 0.3
         
         # Learning need alignment
-        gaps = self._identify_learning_gaps(profile)
         if learning_focus in gaps:
             score += 0.2
         
         # Success rate in similar content
-        relevant_interactions = [
-            i for i in profile.interaction_history
-            if i.get('theme') == theme or i.get('learning_focus') == learning_focus
-        ]
-        if relevant_interactions:
-            success_rate = sum(1 for i in relevant_interactions if i.get('correct', False)) / len(relevant_interactions)
+        success_rate = profile.success_rate_for(theme, learning_focus)
+        if success_rate is not None:
             score += success_rate * 0.2
         
         return min(1.0, score)
@@ -388,6 +504,8 @@ class RecommendationEngine:
 class AdaptiveSystemManager:
     """Main manager for all adaptive learning features."""
     
+    _PROFILE_LOCK_STRIPES = 64  # Power of two, so a stripe is picked with a mask
+    
     def __init__(self):
         self.difficulty_adjuster = DynamicDifficultyAdjuster()
         self.vocabulary_system = AdaptiveVocabularySystem()
@@ -395,25 +513,72 @@ class AdaptiveSystemManager:
         self.interest_builder = InterestGraphBuilder()
         self.recommendation_engine = RecommendationEngine()
         self.profiles = {}  # In-memory profile storage
+        # Recommendations cached per profile object until its version changes;
+        # an entry is dropped when its profile is garbage collected
+        self._recommendation_cache = {}
+        # Updates to one profile are serialized; different children can be updated concurrently
+        self._profiles_lock = threading.Lock()
+        self._profile_locks = [threading.Lock() for _ in range(self._PROFILE_LOCK_STRIPES)]
     
     def get_or_create_profile(self, child_name: str, age: int = 6) -> ChildProfile:
         """Get existing profile or create new one."""
         profile_key = self._generate_profile_key(child_name)
         
-        if profile_key not in self.profiles:
-            self.profiles[profile_key] = ChildProfile(
-                name=child_name,
-                age=age,
-                learning_style=LearningStyle.MIXED,
-                difficulty_level=DifficultyLevel.BEGINNER
-            )
-        
-        return self.profiles[profile_key]
+        with self._profiles_lock:
+            if profile_key not in self.profiles:
+                self.profiles[profile_key] = ChildProfile(
+                    name=child_name,
+                    age=age,
+                    learning_style=LearningStyle.MIXED,
+                    difficulty_level=DifficultyLevel.BEGINNER
+                )
+            
+            return self.profiles[profile_key]
+    
+    def _profile_lock(self, profile: ChildProfile) -> threading.Lock:
+        """Lock stripe guarding updates to this profile object."""
+        return self._profile_locks[(id(profile) >> 4) & (self._PROFILE_LOCK_STRIPES - 1)]
     
     def update_profile_from_interaction(self, profile: ChildProfile, interaction_data: Dict):
         """Update profile based on new interaction."""
+        with self._profile_lock(profile):
+            self._apply_interaction(profile, interaction_data)
+    
+    def update_profile_from_interactions(self, profile: ChildProfile, interactions: List[Dict]):
+        """Update profile from a batch of interactions in a single call.
+        
+        Produces the same profile as calling update_profile_from_interaction for
+        each item, but learning style detection only depends on the final history,
+        so it runs once for the whole batch instead of once per interaction.
+        """
+        if not interactions:
+            return
+        
+        with self._profile_lock(profile):
+            self._apply_interactions(profile, interactions)
+    
+    def batch_update(self, updates: List[Tuple[ChildProfile, Dict]], max_workers: Optional[int] = None):
+        """Apply (profile, interaction) updates for many children concurrently.
+        
+        Each profile receives its interactions in the order given, as one batch;
+        different profiles are updated on a thread pool.
+        """
+        by_profile = {}
+        for profile, interaction_data in updates:
+            by_profile.setdefault(id(profile), (profile, []))[1].append(interaction_data)
+        if not by_profile:
+            return
+        
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(by_profile))) as executor:
+            # list() re-raises the first failure from any worker
+            list(executor.map(lambda item: self.update_profile_from_interactions(*item), by_profile.values()))
+    
+    def _apply_interaction(self, profile: ChildProfile, interaction_data: Dict):
+        """Update profile from one interaction. Caller holds the profile's lock."""
         # Add interaction to history
-        profile.interaction_history.append(interaction_data)
+        profile.record_interaction(interaction_data)
         
         # Update learning metrics
         self._update_learning_metrics(profile, interaction_data)
@@ -432,6 +597,27 @@ class AdaptiveSystemManager:
         
         # Update timestamp
         profile.last_updated = time.time()
+        profile.version += 1
+    
+    def _apply_interactions(self, profile: ChildProfile, interactions: List[Dict]):
+        """Update profile from a non-empty batch of interactions. Caller holds the profile's lock."""
+        self._fold_learning_metrics(profile, interactions)
+        
+        for interaction_data in interactions:
+            profile.record_interaction(interaction_data)
+            
+            # Difficulty moves one step at a time, so it is still adjusted per interaction
+            profile.difficulty_level = self.difficulty_adjuster.analyze_performance(
+                profile, profile.interaction_history
+            )
+            
+            engagement_score = interaction_data.get('engagement_score', 0.5)
+            theme = interaction_data.get('theme', 'unknown')
+            self.interest_builder.update_interest_graph(profile, theme, engagement_score)
+        
+        profile.learning_style = self.style_detector.detect_learning_style(profile)
+        profile.last_updated = time.time()
+        profile.version += 1
     
     def get_adaptive_story_parameters(self, profile: ChildProfile, requested_theme: str) -> Dict:
         """Get adaptive parameters for story generation."""
@@ -441,17 +627,33 @@ class AdaptiveSystemManager:
             'difficulty_level': profile.difficulty_level.value,
             'learning_style': profile.learning_style.value,
             'vocabulary_words': vocabulary_words,
-            'preferred_themes': getattr(profile, 'interest_graph', {}),
-            'learning_metrics': asdict(profile.learning_metrics)
+            'preferred_themes': profile.interest_weights(),
+            'learning_metrics': profile.learning_metrics.to_dict()
         }
     
     def get_recommendations(self, profile: ChildProfile) -> List[Dict]:
         """Get personalized story recommendations."""
-        return self.recommendation_engine.generate_recommendations(profile)
+        key = id(profile)
+        cached = self._recommendation_cache.get(key)
+        if cached and cached[0]() is profile and cached[1] == profile.version:
+            return [dict(recommendation) for recommendation in cached[2]]
+        
+        # Read before computing, so results racing with an update are stored under the older version
+        version = profile.version
+        recommendations = self.recommendation_engine.generate_recommendations(profile)
+        cache = self._recommendation_cache
+        profile_ref = weakref.ref(profile, lambda _, key=key: cache.pop(key, None))
+        cache[key] = (profile_ref, version, recommendations)
+        return [dict(recommendation) for recommendation in recommendations]
     
     def _generate_profile_key(self, child_name: str) -> str:
         """Generate secure profile key."""
-        return hashlib.sha256(child_name.lower().encode()).hexdigest()
+        return self._hash_profile_name(child_name.lower())
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _hash_profile_name(normalized_name: str) -> str:
+        return hashlib.sha256(normalized_name.encode()).hexdigest()
     
     def generate_adaptive_story(self, child_profile: ChildProfile, theme: str, story_generator) -> Dict:
         """Generate an adaptive story based on child's profile and learning needs."""
@@ -463,7 +665,7 @@ class AdaptiveSystemManager:
         learning_focus = learning_gaps[0] if learning_gaps else 'vocabulary'
         
         # Generate the story using the story generator
-        story_text, explanation = story_generator.generate_adventure(
+        story_text, explanation, _ = story_generator.generate_adventure(
             theme=theme,
             child_name=child_profile.name,
             learning_focus=learning_focus
@@ -483,34 +685,47 @@ class AdaptiveSystemManager:
     
     def _update_learning_metrics(self, profile: ChildProfile, interaction_data: Dict):
         """Update learning metrics based on interaction."""
-        metrics = profile.learning_metrics
+        self._fold_learning_metrics(profile, (interaction_data,))
+    
+    def _fold_learning_metrics(self, profile: ChildProfile, interactions: List[Dict]):
+        """Update learning metrics for a batch of interactions in one pass.
         
-        # Update success rate (running average)
-        if 'correct' in interaction_data:
-            current_success = 1.0 if interaction_data['correct'] else 0.0
-            metrics.success_rate = (metrics.success_rate * 0.9) + (current_success * 0.1)
-        
-        # Update response time
-        if 'response_time' in interaction_data:
-            response_time = interaction_data['response_time']
-            metrics.response_time_avg = (metrics.response_time_avg * 0.8) + (response_time * 0.2)
-        
-        # Update comprehension score
-        if 'comprehension_score' in interaction_data:
-            comp_score = interaction_data['comprehension_score']
-            metrics.comprehension_score = (metrics.comprehension_score * 0.8) + (comp_score * 0.2)
-        
-        # Update engagement level
-        if 'engagement_score' in interaction_data:
-            eng_score = interaction_data['engagement_score']
-            metrics.engagement_level = (metrics.engagement_level * 0.8) + (eng_score * 0.2)
-        
-        # Update skill levels based on learning focus and success
-        learning_focus = interaction_data.get('learning_focus', '')
-        if interaction_data.get('correct', False):
-            if 'math' in learning_focus.lower():
-                metrics.math_level = min(4, metrics.math_level + 0.1)
-            elif 'vocabulary' in learning_focus.lower():
-                metrics.vocabulary_level = min(4, metrics.vocabulary_level + 0.1)
-            elif 'problem' in learning_focus.lower():
-                metrics.problem_solving_level = min(4, metrics.problem_solving_level + 0.1)
\ No newline at end of file
+        The running averages are carried in local variables and written back once,
+        which gives the same values as updating the metrics object per interaction.
+        """
+        metrics = profile.learning_metrics
+        success_rate = metrics.success_rate
+        response_time_avg = metrics.response_time_avg
+        comprehension_score = metrics.comprehension_score
+        engagement_level = metrics.engagement_level
+        math_level = metrics.math_level
+        vocabulary_level = metrics.vocabulary_level
+        problem_solving_level = metrics.problem_solving_level
+        
+        for interaction_data in interactions:
+            if 'correct' in interaction_data:
+                current_success = 1.0 if interaction_data['correct'] else 0.0
+                success_rate = (success_rate * 0.9) + (current_success * 0.1)
+            if 'response_time' in interaction_data:
+                response_time_avg = (response_time_avg * 0.8) + (interaction_data['response_time'] * 0.2)
+            if 'comprehension_score' in interaction_data:
+                comprehension_score = (comprehension_score * 0.8) + (interaction_data['comprehension_score'] * 0.2)
+            if 'engagement_score' in interaction_data:
+                engagement_level = (engagement_level * 0.8) + (interaction_data['engagement_score'] * 0.2)
+            
+            if interaction_data.get('correct', False):
+                learning_focus = interaction_data.get('learning_focus', '').lower()
+                if 'math' in learning_focus:
+                    math_level = min(4, math_level + 0.1)
+                elif 'vocabulary' in learning_focus:
+                    vocabulary_level = min(4, vocabulary_level + 0.1)
+                elif 'problem' in learning_focus:
+                    problem_solving_level = min(4, problem_solving_level + 0.1)
+        
+        metrics.success_rate = success_rate
+        metrics.response_time_avg = response_time_avg
+        metrics.comprehension_score = comprehension_score
+        metrics.engagement_level = engagement_level
+        metrics.math_level = math_level
+        metrics.vocabulary_level = vocabulary_level
+        metrics.problem_solving_level = problem_solving_level
@@ -4,6 +4,7 @@ import time
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
+from itertools import islice
 import json
 
 
@@ -505,8 +506,10 @@ class AchievementSystem:
         if len(profile.interaction_history) < 10:
             return False
         
-        recent_success = sum(1 for i in profile.interaction_history[-5:] if i.get('correct', False))
-        early_success = sum(1 for i in profile.interaction_history[:5] if i.get('correct', False))
+        # History may be a bounded deque, which can be iterated from either end but not sliced;
+        # the first sessions may have left it, so their outcomes are kept on the profile
+        recent_success = sum(1 for i in islice(reversed(profile.interaction_history), 5) if i.get('correct', False))
+        early_success = sum(1 for correct in profile.early_outcomes if correct)
         
         return recent_success > early_success
     
@@ -1,8 +1,29 @@
 """Learning integration for different educational focuses."""
 
+from functools import lru_cache
+
+# Stands in for the child's name while templates are cached; swapped out per request
+_NAME_SLOT = "\x00child_name\x00"
+
+
+def _personalize(template, child_name):
+    return template.replace(_NAME_SLOT, child_name) if template else template
+
 
 class LearningIntegrator:
     def embed_math_challenge(self, theme, child_name, difficulty_level="easy"):
+        return _personalize(self._math_template(theme, difficulty_level), child_name)
+    
+    def embed_vocabulary_challenge(self, theme, child_name, age_level="5-9"):
+        return _personalize(self._vocabulary_template(theme), child_name)
+    
+    def embed_problem_solving_challenge(self, theme, child_name):
+        return _personalize(self._problem_solving_template(theme), child_name)
+    
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _math_template(theme, difficulty_level):
+        child_name = _NAME_SLOT
         if difficulty_level == "easy":
             if theme == "dragons":
                 return f"""
@@ -26,7 +47,10 @@ class LearningIntegrator:
                 Make it safe, positive, and engaging. End with the math question for {child_name} to solve.
                 """
     
-    def embed_vocabulary_challenge(self, theme, child_name, age_level="5-9"):
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _vocabulary_template(theme):
+        child_name = _NAME_SLOT
         if theme == "dragons":
             return f"""
             Create a short adventure story for {child_name} (age 5-9) about dragons.
@@ -52,7 +76,10 @@ class LearningIntegrator:
             Make it safe, positive, and engaging. End with asking {child_name} to explain what the word means.
             """
     
-    def embed_problem_solving_challenge(self, theme, child_name):
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _problem_solving_template(theme):
+        child_name = _NAME_SLOT
         if theme == "dragons":
             return f"""
             Create a short adventure story for {child_name} (age 5-9) about dragons.
@@ -1,7 +1,10 @@
 """Multi-Question Story System with Real-Time Adaptive Difficulty."""
 
+import hashlib
 import json
 import re
+import sqlite3
+from contextlib import closing
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
@@ -9,6 +12,70 @@ import time
 from openai import OpenAI
 
 
+# Stands in for the child's name in prompts and generated parts; filled in per session
+_NAME_PLACEHOLDER = "{{NAME}}"
+
+# Tells the model to keep the placeholder, so a generated part suits every child
+_NAME_INSTRUCTION = (
+    f"The child's name is written as {_NAME_PLACEHOLDER}. Wherever the child's name belongs, "
+    f"copy {_NAME_PLACEHOLDER} exactly as written; never replace it with a name."
+)
+
+
+def _fill_name(value, name: str):
+    """Replace the name placeholder with name in every string inside value."""
+    if isinstance(value, str):
+        return value.replace(_NAME_PLACEHOLDER, name)
+    if isinstance(value, dict):
+        return {key: _fill_name(item, name) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill_name(item, name) for item in value]
+    return value
+
+
+class StoryPartCache:
+    """Generated story parts persisted in SQLite and shared by every child and session.
+    
+    Prompts never contain the child's name, only the placeholder, so parts are
+    keyed on their prompt and stored exactly as generated; one generation serves
+    every child who reaches the same point of the same story. Storage errors are ignored; the cache is best effort.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS story_parts (key TEXT PRIMARY KEY, story_data TEXT NOT NULL)"
+                )
+        except sqlite3.Error:
+            pass
+    
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call, so the cache can be used from any thread
+        return sqlite3.connect(self.path, timeout=5)
+    
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            with closing(self._connect()) as connection:
+                row = connection.execute(
+                    "SELECT story_data FROM story_parts WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+    
+    def put(self, key: str, story_data: Dict):
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO story_parts (key, story_data) VALUES (?, ?)",
+                    (key, json.dumps(story_data))
+                )
+        except sqlite3.Error:
+            pass
+
+
 class DifficultyLevel(Enum):
     """Real-time difficulty levels within a single story session."""
     EASY = 1
@@ -52,6 +119,10 @@ class StorySession:
     question_results: List[QuestionResult]
     session_start_time: float
     status: str = "in_progress"  # in_progress, completed, abandoned
+    # Parts generated up front, keyed by answer path ("", "c", "w", "cc", ...; c = correct, w = wrong)
+    pregenerated_parts: Optional[Dict[str, Dict]] = None
+    # Part number -> story data as generated, with the name still a placeholder
+    templated_parts: Optional[Dict[int, Dict]] = None
     
     def __post_init__(self):
         if not self.story_parts:
@@ -60,6 +131,12 @@ class StorySession:
             self.questions = []
         if not self.question_results:
             self.question_results = []
+        if self.templated_parts is None:
+            self.templated_parts = {}
+    
+    def get_answer_path(self) -> str:
+        """Correct/wrong pattern of the answers so far, e.g. "cw"."""
+        return "".join("c" if result.is_correct else "w" for result in self.question_results)
     
     def get_current_story_text(self) -> str:
         """Get the cumulative story text up to current question."""
@@ -182,9 +259,11 @@ class AdaptiveDifficultyManager:
 class MultiQuestionStoryGenerator:
     """Generates cohesive multi-question stories with adaptive difficulty."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache_path: Optional[str] = None):
         self.client = OpenAI(api_key=api_key)
         self.difficulty_manager = AdaptiveDifficultyManager()
+        # Optional on-disk cache of generated parts, reused across children and restarts
+        self.part_cache = StoryPartCache(cache_path) if cache_path else None
     
     def create_story_session(self, child_name: str, theme: str, learning_focus: str) -> StorySession:
         """Create a new multi-question story session."""
@@ -203,10 +282,156 @@ class MultiQuestionStoryGenerator:
             session_start_time=time.time()
         )
     
+    # Parts of an adventure by the answer path leading to them -> JSON key; part 1 is
+    # generated on its own, and the branches after it are pregenerated in one request
+    _ADVENTURE_BRANCHES = {
+        "": "part1",
+        "c": "part2_if_correct",
+        "w": "part2_if_wrong",
+        "cc": "part3_if_cc",
+        "cw": "part3_if_cw",
+        "wc": "part3_if_wc",
+        "ww": "part3_if_ww",
+    }
+    
+    # Completion budget for one story part
+    _PART_MAX_TOKENS = 600
+    
+    def pregenerate_adventure_tree(self, session: StorySession) -> bool:
+        """Generate every part that can follow part 1, for each answer path, in one API call.
+        
+        Call this once part 1 has been served, e.g. from a background thread while the
+        child reads it. The parts are stored on session.pregenerated_parts with the
+        name still a placeholder, and generate_next_story_part serves them. Returns
+        False if nothing usable came back, in which case parts are generated one at a
+        time as before.
+        """
+        first_part = session.templated_parts.get(1)
+        if not first_part:
+            return False
+        prompt = self._build_adventure_tree_prompt(session, first_part)
+        
+        cache_key = self._part_cache_key(prompt)
+        tree = None
+        if cache_key is not None:
+            tree = self.part_cache.get(cache_key)
+        from_api = tree is None
+        branch_count = len(self._ADVENTURE_BRANCHES) - 1
+        
+        if from_api:
+            try:
+                response = self.client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"},
+                    max_tokens=self._PART_MAX_TOKENS * branch_count,
+                    temperature=0.7,
+                    timeout=120
+                )
+                choice = response.choices[0]
+                # A reply cut off at max_tokens is truncated JSON
+                if choice.finish_reason == "length":
+                    return False
+                tree = self._parse_story_response(choice.message.content.strip())
+            except Exception:
+                return False
+            if not isinstance(tree, dict):
+                return False
+        
+        # Branches run parents first, so a branch is kept only if the part it continues was
+        parts = {"": first_part}
+        for path, branch_key in self._ADVENTURE_BRANCHES.items():
+            story_data = tree.get(branch_key) if path else None
+            if (isinstance(story_data, dict) and story_data.get("story_part") and story_data.get("question")
+                    and path[:-1] in parts):
+                parts[path] = story_data
+        if len(parts) == 1:
+            return False
+        
+        if from_api and cache_key is not None and len(parts) == len(self._ADVENTURE_BRANCHES):
+            self.part_cache.put(cache_key, tree)
+        session.pregenerated_parts = parts
+        return True
+    
+    def _build_adventure_tree_prompt(self, session: StorySession, first_part: Dict) -> str:
+        """Build one prompt asking for every branch that can follow the given first part."""
+        # Levels follow from the one part 1 was generated at, even if it has been answered since
+        start_level = (session.question_results[0].difficulty_level if session.question_results
+                       else session.difficulty_level)
+        branch_lines = []
+        for path, branch_key in self._ADVENTURE_BRANCHES.items():
+            if not path:
+                continue
+            # Difficulty follows the same rules process_answer applies after each answer
+            level = start_level
+            for question_number, answer in enumerate(path, start=1):
+                level = self.difficulty_manager.adjust_difficulty(level, answer == "c", question_number)
+            params = self.difficulty_manager.get_difficulty_params(session.learning_focus, level)
+            difficulty_context = self._get_difficulty_context(session.learning_focus, level, params)
+            
+            previous = ", then ".join(
+                "answered correctly" if answer == "c" else "answered incorrectly" for answer in path
+            )
+            parent_key = self._ADVENTURE_BRANCHES[path[:-1]]
+            follows = f"continues {parent_key} after {_NAME_PLACEHOLDER} {previous}"
+            ending = " and brings the story to a satisfying conclusion" if len(path) == 2 else ""
+            branch_lines.append(
+                f'- "{branch_key}": Part {len(path) + 1} of 3; {follows}{ending}. '
+                f'{difficulty_context} (difficulty: {level.name.lower()})'
+            )
+        branches = "\n        ".join(branch_lines)
+        
+        return f"""
+        Continue a 3-part adventure story for {_NAME_PLACEHOLDER} (age 5-9) with theme: {session.theme}.
+        {_NAME_INSTRUCTION}
+        Each part includes one {session.learning_focus} challenge naturally and ends with a clear
+        question for {_NAME_PLACEHOLDER} to answer. The next part depends on whether the answer was
+        correct, so write every branch below. Each branch must follow on from the part it continues.
+        Keep everything age-appropriate, positive, and engaging.
+        
+        part1 (already written): {first_part['story_part']}
+        part1 question: {first_part['question']}
+        
+        Branches:
+        {branches}
+        
+        Return ONLY valid JSON: one object with each branch name above as a key, and as each value:
+        {{
+            "story_part": "Story text for this part...",
+            "question": "Clear question for the child",
+            "correct_answer": "The correct answer",
+            "explanation": "Why this answer is correct",
+            "difficulty_level": "easy, medium or hard",
+            "part_number": 2
+        }}
+        """
+    
+    def _part_cache_key(self, prompt: str) -> Optional[str]:
+        """Cache key for a prompt, which names the child only by placeholder; None without a cache."""
+        if self.part_cache is None:
+            return None
+        return hashlib.sha1(prompt.encode()).hexdigest()
+    
+    def _serve_part(self, session: StorySession, template: Dict, question_num: int) -> Tuple[str, Dict, str]:
+        """Record a templated part on the session and return it with the child's name filled in."""
+        session.templated_parts[question_num] = template
+        story_data = _fill_name(template, session.child_name)
+        explanation = self._generate_explanation(session, story_data, question_num)
+        return story_data["story_part"], story_data, explanation
+    
     def generate_next_story_part(self, session: StorySession) -> Tuple[str, Dict, str]:
         """Generate the next part of the story with embedded question."""
         question_num = session.current_question + 1
         
+        # Served from the pregenerated tree when one exists for this answer path and the
+        # previous part came from the same tree (it may have been generated before the tree arrived)
+        pregenerated_parts = session.pregenerated_parts or {}
+        answer_path = session.get_answer_path()
+        pregenerated = pregenerated_parts.get(answer_path)
+        if (pregenerated and answer_path
+                and session.templated_parts.get(question_num - 1) == pregenerated_parts.get(answer_path[:-1])):
+            return self._serve_part(session, pregenerated, question_num)
+        
         # Get difficulty parameters
         difficulty_params = self.difficulty_manager.get_difficulty_params(
             session.learning_focus, session.difficulty_level
@@ -217,11 +442,18 @@ class MultiQuestionStoryGenerator:
             session, question_num, difficulty_params
         )
         
+        # The prompt leaves the name out, so another child reaching this point shares it
+        cache_key = self._part_cache_key(prompt)
+        if cache_key is not None:
+            cached = self.part_cache.get(cache_key)
+            if cached and "story_part" in cached:
+                return self._serve_part(session, cached, question_num)
+        
         try:
             response = self.client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
-                max_tokens=600,
+                max_tokens=self._PART_MAX_TOKENS,
                 temperature=0.7,
                 timeout=30
             )
@@ -230,13 +462,13 @@ class MultiQuestionStoryGenerator:
             
             # Parse the response
             story_data = self._parse_story_response(content)
-            if not story_data:
+            if not story_data or "story_part" not in story_data:
                 return self._generate_fallback_story_part(session, question_num)
             
-            # Generate explanation
-            explanation = self._generate_explanation(session, story_data, question_num)
+            if cache_key is not None:
+                self.part_cache.put(cache_key, story_data)
             
-            return story_data["story_part"], story_data, explanation
+            return self._serve_part(session, story_data, question_num)
             
         except Exception as e:
             return self._generate_fallback_story_part(session, question_num)
@@ -245,8 +477,11 @@ class MultiQuestionStoryGenerator:
                                        difficulty_params: Dict) -> str:
         """Build prompt for continuing the story with appropriate difficulty."""
         
-        # Get previous story context
-        previous_story = " ".join(session.story_parts)
+        # Get previous story context, as generated so the child's name stays a placeholder
+        previous_story = " ".join(
+            session.templated_parts[number]["story_part"] if number in session.templated_parts else part
+            for number, part in enumerate(session.story_parts, start=1)
+        )
         previous_context = f"\n\nPrevious story: {previous_story}" if previous_story else ""
         
         # Difficulty context
@@ -262,7 +497,8 @@ class MultiQuestionStoryGenerator:
         }
         
         prompt = f"""
-        Continue creating an adventure story for {session.child_name} (age 5-9) with theme: {session.theme}.
+        Continue creating an adventure story for {_NAME_PLACEHOLDER} (age 5-9) with theme: {session.theme}.
+        {_NAME_INSTRUCTION}
         
         {position_context.get(question_num, "")}
         
@@ -271,7 +507,7 @@ class MultiQuestionStoryGenerator:
         2. Include one {session.learning_focus} challenge naturally in this part
         3. {difficulty_context}
         4. Make it age-appropriate, positive, and engaging
-        5. End this part with a clear question for {session.child_name} to answer
+        5. End this part with a clear question for {_NAME_PLACEHOLDER} to answer
         
         {previous_context}
         
@@ -335,24 +571,27 @@ class MultiQuestionStoryGenerator:
     def _generate_fallback_story_part(self, session: StorySession, question_num: int) -> Tuple[str, Dict, str]:
         """Generate fallback story part if API call fails."""
         fallback_stories = {
-            "dragons": f"Part {question_num}: {session.child_name} continues the dragon adventure...",
-            "pirates": f"Part {question_num}: Captain {session.child_name} sails toward the next challenge...",
-            "princesses": f"Part {question_num}: Princess {session.child_name} faces a new quest..."
+            "dragons": f"Part {question_num}: {_NAME_PLACEHOLDER} continues the dragon adventure...",
+            "pirates": f"Part {question_num}: Captain {_NAME_PLACEHOLDER} sails toward the next challenge...",
+            "princesses": f"Part {question_num}: Princess {_NAME_PLACEHOLDER} faces a new quest..."
         }
         
         story_part = fallback_stories.get(session.theme, 
-                                         f"Part {question_num}: {session.child_name} continues the adventure...")
+                                         f"Part {question_num}: {_NAME_PLACEHOLDER} continues the adventure...")
         
-        question_data = {
+        template = {
             "story_part": story_part,
-            "question": f"What do you think {session.child_name} should do next?",
+            "question": f"What do you think {_NAME_PLACEHOLDER} should do next?",
             "correct_answer": "Any creative answer",
             "explanation": "Great thinking!",
             "difficulty_level": session.difficulty_level.name.lower(),
             "part_number": question_num
         }
         
-        return story_part, question_data, "Story generated with backup system."
+        # Recorded like a generated part, so later prompts can build on it
+        session.templated_parts[question_num] = template
+        question_data = _fill_name(template, session.child_name)
+        return question_data["story_part"], question_data, "Story generated with backup system."
     
     def _generate_explanation(self, session: StorySession, story_data: Dict, question_num: int) -> str:
         """Generate explanation for parent dashboard."""
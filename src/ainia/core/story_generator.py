@@ -1,65 +1,205 @@
 """Story generation with GPT-4o and safety validation."""
 
 import os
+import enum
 import hashlib
+import heapq
+import re
+import threading
 import time
 import json
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
 from openai import OpenAI
 from .learning_integrator import LearningIntegrator
 from .prompt_builder import PromptBuilder
 from ..utils.safety_validator import SafetyValidator
 
 
+# Per-process key for cache-key hashing, so keys cannot be precomputed externally
+_CACHE_KEY_SALT = os.urandom(16)
+
+
+class ErrorCode(enum.IntEnum):
+    """Outcome of a generate_adventure call, independent of the user-facing message."""
+    OK = 0
+    INVALID_API_KEY = 1
+    EMPTY_INPUT = 2
+    NAME_TOO_SHORT = 3
+    CONNECTION_ERROR = 4
+    RATE_LIMITED = 5
+    NO_CONTENT = 6
+    UNSAFE_CONTENT = 7
+    UNKNOWN = 8
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    """A generated story kept for reuse with other children."""
+    story: str
+    explanation: str
+    original_child_name: str
+    # time.monotonic() deadlines, stamped by StoryGenerator._cache_put
+    fresh_until: float = 0.0  # Served as-is until this point
+    stale_until: float = 0.0  # Served while being regenerated in the background until this point
+    name_pattern: re.Pattern = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Compiled once per entry; whole-name matches only, so "Emma" never hits "Emmanuel"
+        self.name_pattern = re.compile(rf"(?<!\w){re.escape(self.original_child_name)}(?!\w)")
+
+
 class StoryGenerator:
+    # Responses don't depend on the instance, so every generator shares one store
+    cache = OrderedDict()  # In-memory LRU cache for API responses
+    cache_expiry = 3600  # Cache is fresh for 1 hour
+    cache_max_stale = 5 * 3600  # Then usable, with background regeneration, for 5 more hours
+    cache_maxsize = 1024  # Least recently used entries are evicted beyond this
+    _expiry_heap = []  # (stale_until, cache_key) min-heap for proactive expiry
+    _cache_lock = threading.Lock()
+    _cache_stats = Counter()  # hits, misses, evictions, expired, revalidations
+    _revalidating = set()  # Cache keys with a background regeneration in flight
+    # At most two regenerations at once, on daemon threads so an in-flight API call never blocks exit
+    _revalidation_slots = threading.BoundedSemaphore(2)
+    revalidation_retry_delay = 60  # A failed regeneration leaves the stale copy fresh this long before retrying
+    
     def __init__(self, api_key):
         self.client = OpenAI(api_key=api_key)
         self.safety_keywords = ["age-appropriate", "positive", "educational"]
-        self.cache = {}  # In-memory cache for API responses
-        self.cache_expiry = 3600  # Cache expires after 1 hour
         
     def _generate_cache_key(self, theme, child_name, learning_focus):
         """Generate a unique cache key for the request."""
         # Use theme and learning focus for caching, but not child name for privacy
-        cache_string = f"{theme}_{learning_focus}"
-        return hashlib.md5(cache_string.encode()).hexdigest()
+        key_hash = hashlib.blake2b(digest_size=16, key=_CACHE_KEY_SALT)
+        key_hash.update(theme.strip().lower().encode())
+        key_hash.update(b"\x1f")  # Unit separator keeps the two fields from running together
+        key_hash.update(learning_focus.strip().lower().encode())
+        return key_hash.hexdigest()
+    
+    def _is_cache_valid(self, cache_entry, now=None):
+        """Check if cache entry can still be served (fresh or stale)."""
+        if now is None:
+            now = time.monotonic()
+        return cache_entry.stale_until > now
+    
+    def _is_cache_fresh(self, cache_entry, now=None):
+        """Check if cache entry can be served without regenerating it."""
+        if now is None:
+            now = time.monotonic()
+        return cache_entry.fresh_until > now
+    
+    def _cache_put(self, cache_key, cache_entry):
+        """Store a cache entry, evicting expired and least recently used entries."""
+        now = time.monotonic()
+        cache_entry.fresh_until = now + self.cache_expiry
+        cache_entry.stale_until = cache_entry.fresh_until + self.cache_max_stale
+        with self._cache_lock:
+            self._sweep_expired(now)
+            self.cache[cache_key] = cache_entry
+            self.cache.move_to_end(cache_key)
+            heapq.heappush(self._expiry_heap, (cache_entry.stale_until, cache_key))
+            
+            while len(self.cache) > self.cache_maxsize:
+                self.cache.popitem(last=False)
+                self._cache_stats['evictions'] += 1
+    
+    @classmethod
+    def clear_cache(cls):
+        """Drop all cached stories, their pending expiry entries and the hit/miss statistics.
+        
+        The cache is shared by all generators, so this clears it for every instance.
+        """
+        with cls._cache_lock:
+            cls.cache.clear()
+            cls._expiry_heap.clear()
+            cls._cache_stats.clear()
+    
+    def cache_stats(self):
+        """Return hit, miss, eviction and expiry counts for the shared cache."""
+        with self._cache_lock:
+            return dict(self._cache_stats)
     
-    def _is_cache_valid(self, cache_entry):
-        """Check if cache entry is still valid."""
-        return time.time() - cache_entry['timestamp'] < self.cache_expiry
+    def _sweep_expired(self, now):
+        """Drop entries whose expiry time has passed, oldest first. Caller holds the lock."""
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            _, cache_key = heapq.heappop(heap)
+            cache_entry = self.cache.get(cache_key)
+            # The key may have been refreshed since this heap item was pushed
+            if cache_entry is not None and not self._is_cache_valid(cache_entry, now):
+                del self.cache[cache_key]
+                self._cache_stats['expired'] += 1
     
     def _get_cached_story(self, cache_key, child_name):
         """Get cached story and personalize it with child name."""
-        if cache_key in self.cache and self._is_cache_valid(self.cache[cache_key]):
-            cached_data = self.cache[cache_key]
-            # Personalize cached story with actual child name
-            personalized_story = cached_data['story'].replace(
-                cached_data['original_child_name'], 
-                child_name
-            )
-            personalized_explanation = cached_data['explanation'].replace(
-                cached_data['original_child_name'], 
-                child_name
-            )
-            return personalized_story, personalized_explanation
-        return None, None
+        with self._cache_lock:
+            cached_data = self.cache.get(cache_key)
+            if cached_data is None or not self._is_cache_valid(cached_data):
+                self._cache_stats['misses'] += 1
+                return None, None
+            self.cache.move_to_end(cache_key)
+            self._cache_stats['hits'] += 1
+        
+        # Personalize cached story with actual child name
+        substitute = lambda match: child_name
+        personalized_story = cached_data.name_pattern.sub(substitute, cached_data.story)
+        personalized_explanation = cached_data.name_pattern.sub(substitute, cached_data.explanation)
+        return personalized_story, personalized_explanation
+    
+    def _claim_revalidation(self, cache_key):
+        """Return True if the entry is stale, not already being regenerated, and a slot is free."""
+        with self._cache_lock:
+            cached_data = self.cache.get(cache_key)
+            if cached_data is None or self._is_cache_fresh(cached_data) or cache_key in self._revalidating:
+                return False
+            if not self._revalidation_slots.acquire(blocking=False):
+                return False
+            self._revalidating.add(cache_key)
+            self._cache_stats['revalidations'] += 1
+            return True
+    
+    def _revalidate(self, cache_key, theme, child_name, learning_focus):
+        """Regenerate a stale entry in the background; failures leave the stale copy in place."""
+        error = ErrorCode.UNKNOWN
+        try:
+            error = self._request_story(cache_key, theme, child_name, learning_focus)[2]
+        finally:
+            with self._cache_lock:
+                self._revalidating.discard(cache_key)
+                self._revalidation_slots.release()
+                cached_data = self.cache.get(cache_key)
+                if error != ErrorCode.OK and cached_data is not None:
+                    # Back off instead of firing another API call on every stale hit
+                    cached_data.fresh_until = min(time.monotonic() + self.revalidation_retry_delay,
+                                                  cached_data.stale_until)
     
     def generate_adventure(self, theme, child_name, learning_focus):
-        prompt_builder = PromptBuilder()
-        prompt = prompt_builder.build_prompt(theme, child_name, learning_focus)
-        
         # Input validation
         if not theme or not child_name or not learning_focus:
-            return "🤔 Oops! We need your theme, name, and learning focus to create your adventure!", None
+            return "🤔 Oops! We need your theme, name, and learning focus to create your adventure!", None, ErrorCode.EMPTY_INPUT
         
         if len(child_name.strip()) < 2:
-            return "😊 Please enter a name with at least 2 letters so we can make your story special!", None
+            return "😊 Please enter a name with at least 2 letters so we can make your story special!", None, ErrorCode.NAME_TOO_SHORT
         
         # Check cache first to reduce API calls
         cache_key = self._generate_cache_key(theme, child_name, learning_focus)
         cached_story, cached_explanation = self._get_cached_story(cache_key, child_name)
         if cached_story and cached_explanation:
-            return cached_story, cached_explanation
-            
+            # Past its fresh window: serve it now, and let one caller refresh it off the request path
+            if self._claim_revalidation(cache_key):
+                threading.Thread(
+                    target=self._revalidate, args=(cache_key, theme, child_name, learning_focus),
+                    name="story-revalidate", daemon=True
+                ).start()
+            return cached_story, cached_explanation, ErrorCode.OK
+        
+        return self._request_story(cache_key, theme, child_name, learning_focus)
+    
+    def _request_story(self, cache_key, theme, child_name, learning_focus):
+        """Generate a story through the API and cache it if it passes safety validation."""
+        prompt_builder = PromptBuilder()
+        prompt = prompt_builder.build_prompt(theme, child_name, learning_focus)
+        
         try:
             response = self.client.chat.completions.create(
                 model="gpt-4o",
@@ -70,7 +210,7 @@ class StoryGenerator:
             )
             
             if not response.choices or not response.choices[0].message.content:
-                return "🎭 The story magic didn't work this time. Let's try creating your adventure again!", None
+                return "🎭 The story magic didn't work this time. Let's try creating your adventure again!", None, ErrorCode.NO_CONTENT
             
             story_content = response.choices[0].message.content
             
@@ -81,29 +221,28 @@ class StoryGenerator:
             )
             
             if not is_safe:
-                return "🛡️ Our safety wizards want to make sure your story is perfect. Let's try again!", None
+                return "🛡️ Our safety wizards want to make sure your story is perfect. Let's try again!", None, ErrorCode.UNSAFE_CONTENT
             
             # Store in cache for future use
-            self.cache[cache_key] = {
-                'story': story_content,
-                'explanation': parent_explanation,
-                'original_child_name': child_name,
-                'timestamp': time.time()
-            }
+            self._cache_put(cache_key, CacheEntry(
+                story=story_content,
+                explanation=parent_explanation,
+                original_child_name=child_name
+            ))
             
-            return story_content, parent_explanation
+            return story_content, parent_explanation, ErrorCode.OK
             
         except Exception as e:
             # User-friendly error messages
             error_msg = str(e).lower()
             if "api key" in error_msg or "authentication" in error_msg:
-                return "🔑 There's an issue with the API key. Please ask a grown-up to check the setup!", None
+                return "🔑 There's an issue with the API key. Please ask a grown-up to check the setup!", None, ErrorCode.INVALID_API_KEY
             elif "timeout" in error_msg or "connection" in error_msg:
-                return "🌐 The internet connection is a bit slow. Let's try again in a moment!", None
+                return "🌐 The internet connection is a bit slow. Let's try again in a moment!", None, ErrorCode.CONNECTION_ERROR
             elif "rate limit" in error_msg:
-                return "⏱️ Too many stories are being created right now. Let's wait a moment and try again!", None
+                return "⏱️ Too many stories are being created right now. Let's wait a moment and try again!", None, ErrorCode.RATE_LIMITED
             else:
-                return "🎪 Something unexpected happened, but don't worry! Let's try creating your adventure again!", None
+                return "🎪 Something unexpected happened, but don't worry! Let's try creating your adventure again!", None, ErrorCode.UNKNOWN
     
     def build_constitutional_prompt(self, theme, child_name, learning_focus):
         return f"""
@@ -4,6 +4,7 @@ import os
 import time
 import tempfile
 from datetime import datetime, timedelta
+from types import MappingProxyType
 from typing import Dict, List, Optional, Tuple
 import json
 from dataclasses import asdict
@@ -27,6 +28,19 @@ from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
 
 
+# Display details for known achievement IDs, built once at import
+_ACHIEVEMENT_INFO = MappingProxyType({
+    'first_story_complete': {'emoji': '🎉', 'title': 'First Adventure Complete', 'description': 'Completed first story'},
+    'math_master_beginner': {'emoji': '🧮', 'title': 'Math Explorer', 'description': 'Solved 5 math problems'},
+    'vocabulary_builder': {'emoji': '📚', 'title': 'Word Collector', 'description': 'Learned 10 new words'},
+    'story_enthusiast': {'emoji': '📖', 'title': 'Story Enthusiast', 'description': 'Completed 10 stories'},
+    'theme_explorer': {'emoji': '🗺️', 'title': 'Theme Explorer', 'description': 'Tried all themes'}
+})
+_DEFAULT_ACHIEVEMENT_INFO = MappingProxyType(
+    {'emoji': '⭐', 'title': 'Amazing Achievement', 'description': 'Special milestone reached'}
+)
+
+
 class ProgressReportGenerator:
     """Generate comprehensive PDF progress reports for children and parents."""
     
@@ -341,23 +355,24 @@ class ProgressReportGenerator:
             return None
         
         try:
-            # Prepare data
+            # Prepare data (history may be a deque, which cannot be sliced)
+            history = list(profile.interaction_history)
             dates = []
             success_rates = []
             engagement_scores = []
             
             # Calculate rolling averages
             window_size = 5
-            for i, interaction in enumerate(profile.interaction_history):
+            for i, interaction in enumerate(history):
                 if i < window_size:
                     continue
                     
-                recent_interactions = profile.interaction_history[i-window_size:i]
+                recent_interactions = history[i-window_size:i]
                 success_rate = sum(1 for int_data in recent_interactions if int_data.get('correct', False)) / len(recent_interactions)
                 engagement = sum(int_data.get('engagement_score', 0.5) for int_data in recent_interactions) / len(recent_interactions)
                 
                 # Use interaction timestamp or generate approximate date
-                timestamp = interaction.get('timestamp', time.time() - (len(profile.interaction_history) - i) * 86400)
+                timestamp = interaction.get('timestamp', time.time() - (len(history) - i) * 86400)
                 dates.append(datetime.fromtimestamp(timestamp))
                 success_rates.append(success_rate * 100)
                 engagement_scores.append(engagement * 100)
@@ -442,8 +457,10 @@ class ProgressReportGenerator:
     def _get_date_range(self, profile) -> str:
         """Get date range for the report."""
         if hasattr(profile, 'interaction_history') and profile.interaction_history:
-            # Get first and last interaction dates
-            first_timestamp = profile.interaction_history[0].get('timestamp', time.time())
+            # Get first and last interaction dates; the first may have left the bounded history
+            first_timestamp = profile.first_interaction_timestamp
+            if first_timestamp is None:
+                first_timestamp = time.time()
             last_timestamp = profile.interaction_history[-1].get('timestamp', time.time())
             
             first_date = datetime.fromtimestamp(first_timestamp).strftime('%B %d, %Y')
@@ -456,7 +473,7 @@ class ProgressReportGenerator:
     def _calculate_total_learning_time(self, profile) -> str:
         """Calculate total learning time."""
         if hasattr(profile, 'interaction_history') and profile.interaction_history:
-            total_minutes = sum(interaction.get('session_duration', 8) / 60 for interaction in profile.interaction_history)
+            total_minutes = profile.total_session_duration / 60
             hours = int(total_minutes // 60)
             minutes = int(total_minutes % 60)
             return f"{hours}h {minutes}m"
@@ -486,14 +503,7 @@ class ProgressReportGenerator:
     def _get_achievement_info(self, achievement_id: str) -> Dict:
         """Get achievement information by ID."""
         # This would normally fetch from your achievement system
-        achievement_map = {
-            'first_story_complete': {'emoji': '🎉', 'title': 'First Adventure Complete', 'description': 'Completed first story'},
-            'math_master_beginner': {'emoji': '🧮', 'title': 'Math Explorer', 'description': 'Solved 5 math problems'},
-            'vocabulary_builder': {'emoji': '📚', 'title': 'Word Collector', 'description': 'Learned 10 new words'},
-            'story_enthusiast': {'emoji': '📖', 'title': 'Story Enthusiast', 'description': 'Completed 10 stories'},
-            'theme_explorer': {'emoji': '🗺️', 'title': 'Theme Explorer', 'description': 'Tried all themes'}
-        }
-        return achievement_map.get(achievement_id, {'emoji': '⭐', 'title': 'Amazing Achievement', 'description': 'Special milestone reached'})
+        return _ACHIEVEMENT_INFO.get(achievement_id, _DEFAULT_ACHIEVEMENT_INFO)
     
     def _analyze_math_progress(self, profile) -> str:
         """Analyze math learning progress."""
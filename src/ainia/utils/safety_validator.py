@@ -1,5 +1,7 @@
 """Content safety validation and parent explanations."""
 
+import re
+
 
 class SafetyValidator:
     def __init__(self):
@@ -11,6 +13,9 @@ class SafetyValidator:
         ]
         self.unsafe_words = ["scary", "frightening", "violent", "dangerous", "death", "kill", "hurt", "blood", "weapon"]
         self.positive_indicators = ["positive", "learn", "safe", "fun", "magical", "adventure", "help", "friendly", "treasure", "discover", "find", "how many", "what", "solve"]
+        # Each word list compiled into one alternation so content is scanned once per list
+        self._unsafe_pattern = re.compile('|'.join(map(re.escape, self.unsafe_words)))
+        self._positive_pattern = re.compile('|'.join(map(re.escape, self.positive_indicators)))
     
     def validate_and_explain(self, story, theme, learning_element, child_name):
         # Validate content safety
@@ -25,13 +30,11 @@ class SafetyValidator:
         content_lower = content.lower()
         
         # Check for unsafe words
-        for word in self.unsafe_words:
-            if word in content_lower:
-                return False
+        if self._unsafe_pattern.search(content_lower):
+            return False
         
         # Check for positive elements or educational content indicators
-        positive_found = any(element in content_lower for element in self.positive_indicators)
-        return positive_found
+        return self._positive_pattern.search(content_lower) is not None
     
     def generate_parent_explanation(self, theme, learning_element, child_name, story):
         return f"""
@@ -0,0 +1,76 @@
+"""Pytest coverage for the final optimization checks.
+
+Each check is an independent test so they can run in isolation or in
+parallel (e.g. ``pytest -n auto`` with pytest-xdist installed).
+"""
+
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+# Add the tools directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'tools'))
+
+import final_optimizer
+from final_optimizer import FinalOptimizer, _get_story_gen
+
+
+def _reject_api_key(**kwargs):
+    """Fail a completion the way the API does for a bad key, without the network."""
+    raise Exception("Error code: 401 - Incorrect API key provided")
+
+
+class _OfflineStoryGenerator(final_optimizer.StoryGenerator):
+    """StoryGenerator whose API calls are rejected as unauthenticated."""
+    
+    def __init__(self, api_key):
+        super().__init__(api_key)
+        self.client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=_reject_api_key))
+        )
+
+
+@pytest.fixture(autouse=True)
+def clear_story_cache():
+    """Start every check from an empty shared story cache."""
+    _get_story_gen("test_key").clear_cache()
+    yield
+    _get_story_gen("test_key").clear_cache()
+
+
+@pytest.fixture
+def optimizer():
+    """Create a fresh optimizer for each check."""
+    return FinalOptimizer()
+
+
+def test_error_handling(optimizer, monkeypatch):
+    """Invalid keys, empty inputs and short names return friendly messages."""
+    monkeypatch.setattr(final_optimizer, "StoryGenerator", _OfflineStoryGenerator)
+    results = optimizer.test_error_handling()
+    assert results['failed_tests'] == 0, results['errors_found']
+
+
+def test_memory_usage(optimizer):
+    """Creating several generators stays within the memory budget."""
+    results = optimizer.test_memory_usage()
+    assert results['leaked_instances'] == 0, results['leak_referrers']
+    assert results['memory_efficient'], results
+
+
+def test_cache_efficiency(optimizer):
+    """Cache keys, personalization and expiry behave as expected."""
+    results = optimizer.test_cache_efficiency()
+    assert results['cache_key_consistency']
+    assert results['cache_key_privacy']
+    assert results['personalization_works']
+    assert results['expiry_works']
+    assert results['cache_hits'] >= 1
+    assert results['cache_misses'] >= 1
+
+
+def test_component_integration(optimizer):
+    """Prompt building, learning integration and safety validation work together."""
+    results = optimizer.validate_component_integration()
+    assert not results['integration_issues'], results['integration_issues']
@@ -0,0 +1,72 @@
+"""Smoke tests for the stress-test harness, run with a stub persona list."""
+
+import pytest
+import sys
+import os
+from dataclasses import dataclass
+
+# Add the scripts directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from stress_test import StressTestRunner
+
+
+@dataclass
+class StubPersona:
+    """The persona fields the stress test reads."""
+    name: str
+    age: int
+    preferred_theme: str
+    learning_focus: str
+
+
+PERSONAS = [
+    StubPersona("Emma", 5, "dragons", "counting and addition"),
+    StubPersona("Alex", 7, "pirates", "vocabulary"),
+    StubPersona("Sam", 9, "princesses", "problem solving"),
+]
+
+
+@pytest.fixture
+def runner():
+    """Create a runner over the stub personas and shut its pool down afterwards."""
+    with StressTestRunner(api_key="test_key", personas=PERSONAS) as tester:
+        yield tester
+
+
+def test_concurrent_sessions(runner):
+    """Threaded sessions all succeed and are analyzed."""
+    results = runner.run_concurrent_sessions(num_sessions=6, max_workers=3)
+    assert results['total_sessions'] == 6
+    assert results['successful_sessions'] == 6
+    assert results['warmup_sessions'] == 3
+    assert 'error_analysis' not in results
+
+
+def test_concurrent_sessions_in_processes(runner):
+    """Process-pool sessions are gathered back into the parent's results."""
+    results = runner.run_concurrent_sessions(num_sessions=4, max_workers=2, use_processes=True)
+    assert results['total_sessions'] == 4
+    assert results['successful_sessions'] == 4
+
+
+def test_empty_persona_list_is_rejected():
+    """A runner needs at least one persona to cycle sessions through."""
+    with pytest.raises(ValueError):
+        StressTestRunner(api_key="test_key", personas=[])
+
+
+def test_unknown_persona_fails_cleanly(runner):
+    """A persona outside the list is reported as a failed session, not raised."""
+    result = runner.simulate_user_session(1, "Nobody")
+    assert not result['success']
+    assert result['error'] == 'Persona not found'
+
+
+def test_session_state_validation_and_report(runner):
+    """State validation passes and the report prints without errors."""
+    stress_results = runner.run_concurrent_sessions(num_sessions=3, max_workers=3)
+    validation_results = runner.run_session_state_validation()
+    assert validation_results['data_integrity']
+    assert validation_results['consistency_rate'] == 100
+    runner.generate_stress_test_report(stress_results, validation_results)
@@ -0,0 +1,225 @@
+"""Pytest coverage for the name-agnostic story part cache."""
+
+import json
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from ainia.core.multi_question_system import (
+    MultiQuestionStoryGenerator,
+    StoryPartCache,
+    _NAME_PLACEHOLDER,
+)
+
+
+def _story_part(story_part: str) -> dict:
+    """A parsed story part, as the model writes it, mentioning the child in its question too."""
+    return {
+        "story_part": story_part,
+        "question": f"How many dragons did {_NAME_PLACEHOLDER} count?",
+        "correct_answer": "3",
+        "explanation": "Three dragons flew past.",
+        "difficulty_level": "easy",
+        "part_number": 1,
+    }
+
+
+class _FakeCompletions:
+    """Chat completions that return fixed replies in turn and keep the prompts they were sent.
+
+    The last reply is repeated once the others are used up.
+    """
+
+    def __init__(self, *replies: dict, finish_reason: str = "stop"):
+        self.replies = list(replies)
+        self.finish_reason = finish_reason
+        self.prompts = []
+
+    def create(self, **kwargs):
+        self.prompts.append(kwargs["messages"][0]["content"])
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        message = SimpleNamespace(content=json.dumps(reply))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=self.finish_reason)])
+
+
+def _generator(cache_path: str, *replies: dict, finish_reason: str = "stop") -> MultiQuestionStoryGenerator:
+    """Generator on a temp-file cache whose API calls return the given replies."""
+    generator = MultiQuestionStoryGenerator("test_key", cache_path=cache_path)
+    completions = _FakeCompletions(*replies, finish_reason=finish_reason)
+    generator.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return generator
+
+
+def _first_part(generator: MultiQuestionStoryGenerator, child_name: str):
+    session = generator.create_story_session(child_name, "dragons", "counting and addition")
+    return generator.generate_next_story_part(session)
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "story_parts.sqlite3")
+
+
+def test_cache_round_trip(cache_path):
+    """Stored parts come back unchanged from the SQLite file."""
+    cache = StoryPartCache(cache_path)
+    story_data = _story_part(f"Once upon a time, {_NAME_PLACEHOLDER} met a dragon.")
+    cache.put("key", story_data)
+    assert StoryPartCache(cache_path).get("key") == story_data
+    assert cache.get("missing") is None
+
+
+def test_prompt_names_the_child_by_placeholder_only(cache_path):
+    """The child's name never reaches the model, so the prompt is the same for every child."""
+    generator = _generator(cache_path, _story_part(f"{_NAME_PLACEHOLDER} met a dragon."))
+    _first_part(generator, "Emma")
+    prompt, = generator.client.chat.completions.prompts
+    assert "Emma" not in prompt
+    assert _NAME_PLACEHOLDER in prompt
+
+
+def test_part_starting_with_the_name_is_shared_across_two_names(cache_path):
+    """A part generated for one child is served to another with their own name filled in."""
+    first = _generator(cache_path, _story_part(
+        f"{_NAME_PLACEHOLDER} met a dragon. {_NAME_PLACEHOLDER} smiled and waved."
+    ))
+    story, story_data, _ = _first_part(first, "Emma")
+    assert story == "Emma met a dragon. Emma smiled and waved."
+    assert story_data["question"] == "How many dragons did Emma count?"
+
+    second = _generator(cache_path, _story_part("Not used"))
+    story, story_data, _ = _first_part(second, "Liam")
+    assert second.client.chat.completions.prompts == []
+    assert story == "Liam met a dragon. Liam smiled and waved."
+    assert story_data["question"] == "How many dragons did Liam count?"
+
+
+def test_name_that_is_also_a_word(cache_path):
+    """Only the placeholder is filled in, so the word "hope" survives for a child called Hope."""
+    story_data = _story_part(f"{_NAME_PLACEHOLDER} found new hope in the dragon's eyes.")
+    story, _, _ = _first_part(_generator(cache_path, story_data), "Hope")
+    assert story == "Hope found new hope in the dragon's eyes."
+
+    second = _generator(cache_path, _story_part("Not used"))
+    story, _, _ = _first_part(second, "May")
+    assert second.client.chat.completions.prompts == []
+    assert story == "May found new hope in the dragon's eyes."
+
+
+def test_lowercase_name(cache_path):
+    """A name is filled in exactly as the child typed it."""
+    generator = _generator(cache_path, _story_part(f"{_NAME_PLACEHOLDER} found gold in the cave."))
+    story, _, _ = _first_part(generator, "emma")
+    assert story == "emma found gold in the cave."
+
+
+def test_continuation_prompt_keeps_earlier_parts_templated(cache_path):
+    """Earlier parts go back to the model with the placeholder, not the child's name."""
+    generator = _generator(cache_path, _story_part(f"{_NAME_PLACEHOLDER} met a dragon."))
+    session = generator.create_story_session("Emma", "dragons", "counting and addition")
+    story, question_data, _ = generator.generate_next_story_part(session)
+    session.story_parts.append(story)
+    session.questions.append(question_data)
+    generator.process_answer(session, "3", 4.0)
+
+    generator.generate_next_story_part(session)
+    prompt = generator.client.chat.completions.prompts[-1]
+    assert f"Previous story: {_NAME_PLACEHOLDER} met a dragon." in prompt
+    assert "Emma" not in prompt
+
+
+def _adventure_tree(*branch_keys: str) -> dict:
+    return {key: _story_part(f"{_NAME_PLACEHOLDER} reached {key}.") for key in branch_keys}
+
+
+_ALL_BRANCHES = [key for path, key in MultiQuestionStoryGenerator._ADVENTURE_BRANCHES.items() if path]
+
+
+def _answer(generator: MultiQuestionStoryGenerator, session, story: str, question_data: dict, correct: bool):
+    """Show a part the way the app does, then answer its question."""
+    session.story_parts.append(story)
+    session.questions.append(question_data)
+    generator.process_answer(session, "3" if correct else "7", 4.0)
+
+
+def test_tree_continues_the_part_already_served(cache_path):
+    """Branches are generated after part 1, which goes into the prompt, and served by answer path."""
+    generator = _generator(
+        cache_path, _story_part(f"{_NAME_PLACEHOLDER} met a dragon."), _adventure_tree(*_ALL_BRANCHES)
+    )
+    session = generator.create_story_session("Emma", "dragons", "counting and addition")
+    story, question_data, _ = generator.generate_next_story_part(session)
+    assert generator.pregenerate_adventure_tree(session)
+    assert f"part1 (already written): {_NAME_PLACEHOLDER} met a dragon." in generator.client.chat.completions.prompts[-1]
+
+    _answer(generator, session, story, question_data, correct=False)
+    story, question_data, _ = generator.generate_next_story_part(session)
+    assert story == "Emma reached part2_if_wrong."
+    _answer(generator, session, story, question_data, correct=True)
+    story, _, _ = generator.generate_next_story_part(session)
+    assert story == "Emma reached part3_if_wc."
+    assert len(generator.client.chat.completions.prompts) == 2
+
+
+def test_tree_needs_part_one_first(cache_path):
+    generator = _generator(cache_path, _adventure_tree(*_ALL_BRANCHES))
+    session = generator.create_story_session("Emma", "dragons", "counting and addition")
+    assert not generator.pregenerate_adventure_tree(session)
+    assert generator.client.chat.completions.prompts == []
+
+
+def test_truncated_tree_is_discarded(cache_path):
+    """A reply cut off at max_tokens is not parsed or cached."""
+    generator = _generator(cache_path, _story_part("Part one."), _adventure_tree(*_ALL_BRANCHES),
+                           finish_reason="length")
+    session = generator.create_story_session("Emma", "dragons", "counting and addition")
+    generator.generate_next_story_part(session)
+    assert not generator.pregenerate_adventure_tree(session)
+    assert session.pregenerated_parts is None
+
+
+def test_tree_drops_branches_whose_parent_is_missing(cache_path):
+    """A part 3 is only kept if the part 2 it continues came back too."""
+    generator = _generator(
+        cache_path, _story_part("Part one."), _adventure_tree("part2_if_wrong", "part3_if_cc", "part3_if_wc")
+    )
+    session = generator.create_story_session("Emma", "dragons", "counting and addition")
+    generator.generate_next_story_part(session)
+    assert generator.pregenerate_adventure_tree(session)
+    assert set(session.pregenerated_parts) == {"", "w", "wc"}
+
+
+def test_tree_part_is_not_served_after_a_separately_generated_parent(cache_path):
+    """If part 2 was generated before the tree arrived, part 3 must not come from the tree."""
+    generator = _generator(
+        cache_path, _story_part("Part one."), _story_part("Part two, generated alone."),
+        _adventure_tree(*_ALL_BRANCHES), _story_part("Part three, generated alone.")
+    )
+    session = generator.create_story_session("Emma", "dragons", "counting and addition")
+    story, question_data, _ = generator.generate_next_story_part(session)
+    _answer(generator, session, story, question_data, correct=True)
+    story, question_data, _ = generator.generate_next_story_part(session)
+    assert generator.pregenerate_adventure_tree(session)
+
+    _answer(generator, session, story, question_data, correct=True)
+    story, _, _ = generator.generate_next_story_part(session)
+    assert story == "Part three, generated alone."
+
+
+def test_tree_from_the_cache_is_not_written_back(cache_path, monkeypatch):
+    """Only trees fresh from the API are stored."""
+    first = _generator(cache_path, _story_part("Part one."), _adventure_tree(*_ALL_BRANCHES))
+    session = first.create_story_session("Emma", "dragons", "counting and addition")
+    first.generate_next_story_part(session)
+    assert first.pregenerate_adventure_tree(session)
+
+    second = _generator(cache_path, _story_part("Not used"))
+    monkeypatch.setattr(second.part_cache, "put", lambda *args: pytest.fail("cache hit was written back"))
+    session = second.create_story_session("Liam", "dragons", "counting and addition")
+    second.generate_next_story_part(session)
+    assert second.pregenerate_adventure_tree(session)
+    assert second.client.chat.completions.prompts == []